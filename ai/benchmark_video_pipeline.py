@@ -0,0 +1,83 @@
+"""
+Benchmark of the video pipeline (job queue, single-flight and cache) against
+the offline mock backend. Simulates players arriving with random age/gender
+and measures how long each one waits for their scenario video.
+
+    python ai/benchmark_video_pipeline.py --players 200 --latency fixed:2 --seed 1
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the video pipeline with the mock Veo backend")
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--scenarios", type=int, default=4)
+    parser.add_argument("--arrival-rate", type=float, default=20.0, help="Players per second")
+    parser.add_argument("--latency", default="fixed:2", help="Mock generation latency, e.g. normal:30,10")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--quota-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=4, help="VIDEO_JOB_WORKERS")
+    parser.add_argument("--max-queue", type=int, default=1000, help="VIDEO_JOB_MAX_QUEUE")
+    args = parser.parse_args()
+
+    # Måste sättas innan ai-modulerna importeras
+    os.environ["VIDEO_BACKEND"] = "mock"
+    os.environ["MOCK_VEO_LATENCY"] = args.latency
+    os.environ["MOCK_VEO_ERROR_RATE"] = str(args.error_rate)
+    os.environ["MOCK_VEO_QUOTA_RATE"] = str(args.quota_rate)
+    os.environ["MOCK_VEO_SEED"] = str(args.seed)
+    os.environ["VIDEO_JOB_WORKERS"] = str(args.workers)
+    os.environ["VIDEO_JOB_MAX_QUEUE"] = str(args.max_queue)
+    cache_dir = tempfile.mkdtemp(prefix="video_cache_bench_")
+    os.environ["VIDEO_CACHE_DIR"] = cache_dir
+
+    from ai.video_jobs import video_jobs
+    from ai.video_cache import video_cache
+    from ai.video_generation import video_generations
+
+    rng = random.Random(args.seed)
+    jobs = []
+    start = time.monotonic()
+    for _ in range(args.players):
+        user_info = {"age": str(rng.randint(18, 30)), "gender": rng.choice(["male", "female"])}
+        for scenario_number in range(1, args.scenarios + 1):
+            job = video_jobs.submit(user_info, scenario_number)
+            if job:
+                jobs.append(job)
+        time.sleep(rng.expovariate(args.arrival_rate))
+
+    waits = []
+    failed = 0
+    for job in jobs:
+        try:
+            job.result()
+        except Exception:
+            failed += 1
+            continue
+        waits.append(job.finished_at - job.submitted_at)
+
+    elapsed = time.monotonic() - start
+    video_jobs.shutdown()
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    percentiles = statistics.quantiles(waits, n=100) if len(waits) > 1 else [0.0] * 99
+    print(f"Players: {args.players}, jobs: {len(jobs)}, failed: {failed}, elapsed: {elapsed:.1f}s")
+    print(f"Wait per video: p50 {statistics.median(waits):.2f}s, p99 {percentiles[98]:.2f}s, max {max(waits):.2f}s")
+    print(f"Queue:        {video_jobs.stats()}")
+    print(f"Cache:        {video_cache.stats()}")
+    print(f"Single-flight: {video_generations.stats()}")
+
+
+if __name__ == "__main__":
+    main()
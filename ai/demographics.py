@@ -0,0 +1,103 @@
+from dotenv import load_dotenv
+from typing import NamedTuple
+
+import os
+import threading
+
+
+load_dotenv()
+
+# Åldersband som delar samma video, tom sträng = exakt ålder i prompten
+DEMOGRAPHIC_AGE_BANDS = os.getenv("DEMOGRAPHIC_AGE_BANDS", "18-24,25-34,35-49,50-64,65-100")
+DEMOGRAPHIC_DEFAULT_AGE = int(os.getenv("DEMOGRAPHIC_DEFAULT_AGE", "30"))
+
+# Värden från registreringsformuläret (och äldre engelska värden) -> ord i prompten
+GENDER_MAP = {
+    "man": "male",
+    "male": "male",
+    "m": "male",
+    "kvinna": "female",
+    "female": "female",
+    "f": "female",
+    "k": "female",
+}
+DEFAULT_GENDER = "person"  # Annat, Vill inte ange och okända värden
+
+
+class PromptVariant(NamedTuple):
+    age: str
+    gender: str
+    bucket: str  # t.ex. "25-34/female", nyckel för statistiken
+
+
+def parse_age_bands(spec: str) -> list[tuple[int, int]]:
+    """"18-24,25-34,65-100" -> [(18, 24), (25, 34), (65, 100)]."""
+
+    bands = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        low, _, high = part.partition("-")
+        low, high = int(low), int(high or low)
+        if high < low:
+            raise ValueError(f"Invalid age band: {part!r}")
+        bands.append((low, high))
+    return sorted(bands)
+
+
+class DemographicBuckets:
+    """
+    Maps a player profile to the canonical age and gender used in the prompts,
+    so players in the same bucket share one cached video. Each band is rendered
+    with its middle age. Hit/miss counts per bucket show what each bucket
+    costs in generations versus what it gains in personalization.
+    """
+
+    def __init__(self,
+                 age_bands: str = DEMOGRAPHIC_AGE_BANDS,
+                 gender_map: dict = GENDER_MAP,
+                 default_gender: str = DEFAULT_GENDER,
+                 default_age: int = DEMOGRAPHIC_DEFAULT_AGE):
+        self.age_bands = parse_age_bands(age_bands)
+        self.gender_map = {key.lower(): value for key, value in gender_map.items()}
+        self.default_gender = default_gender
+        self.default_age = default_age
+        self._lock = threading.Lock()
+        self._stats: dict[str, list] = {}  # bucket -> [hits, misses]
+
+    def _age(self, age) -> tuple[int, str]:
+        try:
+            age = int(age)
+        except (TypeError, ValueError):
+            age = self.default_age
+
+        for low, high in self.age_bands:
+            if low <= age <= high:
+                return (low + high) // 2, f"{low}-{high}"
+        # Utanför alla band (eller inga band): exakt ålder
+        return age, str(age)
+
+    def variant(self, user_info: dict) -> PromptVariant:
+        age, age_bucket = self._age(user_info.get("age"))
+        gender = self.gender_map.get(str(user_info.get("gender") or "").strip().lower(), self.default_gender)
+        return PromptVariant(str(age), gender, f"{age_bucket}/{gender}")
+
+    def record(self, bucket: str, hit: bool) -> None:
+        with self._lock:
+            counts = self._stats.setdefault(bucket, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                bucket: {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                }
+                for bucket, (hits, misses) in sorted(self._stats.items())
+            }
+
+
+demographic_buckets = DemographicBuckets()
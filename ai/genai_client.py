@@ -0,0 +1,198 @@
+from contextlib import contextmanager
+from google import genai
+from google.genai import types
+from dotenv import load_dotenv
+
+import httpx
+import os
+import threading
+import time
+
+
+load_dotenv()
+
+# Connection-pool för den delade klienten
+GENAI_MAX_CONNECTIONS = int(os.getenv("GENAI_MAX_CONNECTIONS", "20"))
+GENAI_MAX_KEEPALIVE = int(os.getenv("GENAI_MAX_KEEPALIVE", "10"))
+GENAI_KEEPALIVE_EXPIRY = float(os.getenv("GENAI_KEEPALIVE_EXPIRY", "60"))
+GENAI_TIMEOUT = float(os.getenv("GENAI_TIMEOUT", "120"))
+# Så många transportfel i rad innan klienten och dess connections byggs om
+GENAI_MAX_TRANSPORT_ERRORS = int(os.getenv("GENAI_MAX_TRANSPORT_ERRORS", "3"))
+
+
+class GenaiClientManager:
+    """
+    Owns one genai.Client for the whole process, backed by a pooled httpx
+    transport so TLS connections are reused between generations, polls and
+    downloads. Callers borrow the client instead of creating and closing
+    their own. Consecutive transport errors mark the client unhealthy and it
+    is rebuilt with a fresh pool on the next borrow; the old pool is closed as
+    soon as the last borrow still using it ends.
+    """
+
+    def __init__(self,
+                 api_key: str | None = None,
+                 max_connections: int = GENAI_MAX_CONNECTIONS,
+                 max_keepalive: int = GENAI_MAX_KEEPALIVE,
+                 keepalive_expiry: float = GENAI_KEEPALIVE_EXPIRY,
+                 timeout: float = GENAI_TIMEOUT,
+                 max_transport_errors: int = GENAI_MAX_TRANSPORT_ERRORS):
+        self._api_key = api_key
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = timeout
+        self.max_transport_errors = max_transport_errors
+        self._lock = threading.Lock()
+        self._client: genai.Client | None = None
+        self._http: httpx.Client | None = None
+        # Pool -> antal pågående borrow(), en ersatt pool stängs när den når noll
+        self._in_use: dict[httpx.Client, int] = {}
+        self._retired = 0
+        self.api_key: str | None = None
+        self._closed = False
+        self._created = 0
+        self._borrows = 0
+        self._transport_errors = 0
+        self._consecutive_errors = 0
+        self._last_error = ""
+        self._last_error_at = 0.0
+
+    def get(self) -> genai.Client:
+        """Returns the shared client, creating it on first use. Raises ValueError without an API key."""
+
+        client = self._client
+        if client is not None:
+            return client
+
+        with self._lock:
+            if self._client is None:
+                if self._closed:
+                    raise RuntimeError("The genai client manager has been shut down")
+                self._create()
+            return self._client
+
+    def _create(self) -> None:
+        api_key = self._api_key or os.getenv("GEMINI_API_KEY")
+        http = httpx.Client(limits=self.limits, timeout=self.timeout)
+        try:
+            client = genai.Client(
+                api_key=api_key,
+                http_options=types.HttpOptions(httpx_client=http)
+            )
+        except Exception:
+            http.close()
+            raise
+        self._http = http
+        self._client = client
+        self.api_key = api_key
+        self._created += 1
+        self._consecutive_errors = 0
+
+    def http(self) -> httpx.Client:
+        """The pooled transport under the shared client, for raw requests such as streamed downloads."""
+
+        while True:
+            self.get()
+            http = self._http
+            if http is not None:
+                return http
+
+    @contextmanager
+    def borrow(self):
+        """
+        with genai_clients.borrow() as client: ...
+
+        The client is not closed afterwards. Transport errors raised inside the
+        block count towards the health check; API errors (4xx/5xx) do not.
+        """
+        while True:
+            self.get()
+            with self._lock:
+                client, http = self._client, self._http
+                # Klienten kan ha ersatts mellan get() och låset
+                if client is not None:
+                    self._borrows += 1
+                    self._in_use[http] = self._in_use.get(http, 0) + 1
+                    break
+        try:
+            yield client
+        except httpx.TransportError as e:
+            self.record_transport_error(e)
+            raise
+        else:
+            self.record_success()
+        finally:
+            self._release(client, http)
+
+    def _release(self, client: genai.Client, http: httpx.Client) -> None:
+        with self._lock:
+            remaining = self._in_use[http] - 1
+            if remaining:
+                self._in_use[http] = remaining
+                return
+            del self._in_use[http]
+            if http is self._http:
+                return
+        # Sista lånet av en ersatt klient, nu kan dess pool stängas
+        self._close_client(client, http)
+
+    @staticmethod
+    def _close_client(client: genai.Client, http: httpx.Client) -> None:
+        try:
+            client.close()
+        finally:
+            http.close()
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive_errors = 0
+
+    def record_transport_error(self, error: Exception) -> None:
+        with self._lock:
+            self._transport_errors += 1
+            self._consecutive_errors += 1
+            self._last_error = repr(error)
+            self._last_error_at = time.time()
+            if self._consecutive_errors < self.max_transport_errors:
+                return
+            print(f"genai client unhealthy after {self._consecutive_errors} transport errors, reconnecting...")
+            client, http = self._client, self._http
+            self._client = None
+            self._http = None
+            if client is None:
+                return
+            self._retired += 1
+            # Pågående lån får köra klart, den sista stänger poolen i _release
+            if http in self._in_use:
+                return
+        self._close_client(client, http)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            client, http = self._client, self._http
+            self._client = None
+            self._http = None
+        if client is not None:
+            self._close_client(client, http)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "connected": self._client is not None,
+                "healthy": self._consecutive_errors < self.max_transport_errors,
+                "clients_created": self._created,
+                "clients_retired": self._retired,
+                "pools_in_use": len(self._in_use),
+                "borrows": self._borrows,
+                "transport_errors": self._transport_errors,
+                "consecutive_errors": self._consecutive_errors,
+                "last_error": self._last_error,
+                "last_error_at": self._last_error_at,
+            }
+
+
+genai_clients = GenaiClientManager()
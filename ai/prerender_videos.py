@@ -0,0 +1,167 @@
+"""
+Pre-renders the scenario × age × gender video matrix into the video cache so
+players never have to wait for Veo. Ages and genders are mapped through the
+demographic buckets (DEMOGRAPHIC_AGE_BANDS) exactly like in the game, so
+only one video per bucket is generated. Videos that are already cached are
+skipped, so an interrupted or quota-limited run continues where it stopped
+when started again.
+
+    python ai/prerender_videos.py --dry-run
+    python ai/prerender_videos.py --concurrency 2
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from ai.prompt_registry import prompt_registry
+from ai.video_cache import video_cache
+from ai.video_generation import get_video, resolve_video_key
+
+
+def parse_ages(spec: str) -> list[int]:
+    """"18-100" or "21,30,45" (or a mix) -> sorted list of ages."""
+
+    ages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        low, _, high = part.partition("-")
+        ages.update(range(int(low), int(high or low) + 1))
+    return sorted(ages)
+
+
+def build_matrix(scenarios: list[int], ages: list[int], genders: list[str]) -> dict:
+    """
+    cache key -> {"user_info", "scenario_number", "variants"}. Combinations
+    whose prompts render identically share one key and are generated once.
+    """
+
+    matrix = {}
+    for scenario_number in scenarios:
+        for age in ages:
+            for gender in genders:
+                user_info = {"age": str(age), "gender": gender}
+                _, _, cache_key = resolve_video_key(user_info, scenario_number)
+                entry = matrix.setdefault(cache_key, {
+                    "user_info": user_info,
+                    "scenario_number": scenario_number,
+                    "variants": 0
+                })
+                entry["variants"] += 1
+    return matrix
+
+
+def report_coverage(matrix: dict, scenarios: list[int]) -> float:
+    print("\nCoverage per scenario (videos cached / videos in matrix):")
+    total = cached_total = 0
+    for scenario_number in scenarios:
+        keys = [key for key, entry in matrix.items() if entry["scenario_number"] == scenario_number]
+        cached = sum(1 for key in keys if video_cache.contains(key))
+        total += len(keys)
+        cached_total += cached
+        percent = 100 * cached / len(keys) if keys else 100.0
+        print(f"  scenario_{scenario_number}: {cached}/{len(keys)} ({percent:.1f}%)")
+
+    coverage = cached_total / total if total else 1.0
+    print(f"  total: {cached_total}/{total} ({100 * coverage:.1f}%)")
+    return coverage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render scenario videos for every age and gender into the video cache")
+    parser.add_argument("--scenarios", default="", help="Comma-separated scenario numbers (default: all in prompts.json)")
+    parser.add_argument("--ages", default="18-100", help="Ages to render, e.g. 18-100 or 21,30,45")
+    parser.add_argument("--genders", default="Man,Kvinna,Annat,Vill inte ange",
+                        help="Comma-separated gender values as chosen at registration")
+    parser.add_argument("--concurrency", type=int, default=2, help="Generations running at the same time")
+    parser.add_argument("--max-videos", type=int, default=0, help="Stop after this many generations (0 = no limit)")
+    parser.add_argument("--max-failures", type=int, default=5, help="Stop after this many failures in a row")
+    parser.add_argument("--dry-run", action="store_true", help="Only report coverage")
+    args = parser.parse_args()
+
+    if args.scenarios:
+        scenarios = [int(s) for s in args.scenarios.split(",") if s.strip()]
+    else:
+        scenarios = prompt_registry.scenario_numbers()
+    ages = parse_ages(args.ages)
+    genders = [g.strip() for g in args.genders.split(",") if g.strip()]
+
+    matrix = build_matrix(scenarios, ages, genders)
+    missing = [key for key in matrix if not video_cache.contains(key)]
+    print(f"Matrix: {len(scenarios)} scenarios × {len(ages)} ages × {len(genders)} genders "
+          f"= {len(matrix)} unique videos, {len(missing)} missing")
+
+    if args.dry_run or not missing:
+        coverage = report_coverage(matrix, scenarios)
+        sys.exit(0 if coverage == 1.0 else 1)
+
+    if args.max_videos:
+        missing = missing[:args.max_videos]
+
+    generated = failed = consecutive_failures = 0
+    stop_reason = ""
+    start = time.monotonic()
+    pending = set()
+    queue = iter(missing)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        try:
+            while True:
+                # Högst concurrency generationer åt gången, nya startas bara när en blir klar
+                while not stop_reason and len(pending) < args.concurrency:
+                    key = next(queue, None)
+                    if key is None:
+                        break
+                    entry = matrix[key]
+                    pending.add(executor.submit(get_video, entry["user_info"], entry["scenario_number"]))
+
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        video = future.result()
+                    except Exception as e:
+                        print(f"Generation failed: {e}")
+                        video = {"video_exists": False}
+
+                    if video["video_exists"]:
+                        generated += 1
+                        consecutive_failures = 0
+                        print(f"[{generated}/{len(missing)}] {video['url']}")
+                        continue
+
+                    failed += 1
+                    consecutive_failures += 1
+                    if video.get("quota_exceeded"):
+                        stop_reason = "video generation quota exceeded"
+                    elif consecutive_failures >= args.max_failures:
+                        stop_reason = f"{consecutive_failures} failures in a row"
+        except KeyboardInterrupt:
+            # Redan genererade videor ligger i cachen, nästa körning fortsätter därifrån
+            stop_reason = "interrupted"
+            for future in pending:
+                future.cancel()
+
+    elapsed = time.monotonic() - start
+    print(f"\nGenerated {generated} videos, {failed} failed, in {elapsed:.0f}s")
+    if stop_reason:
+        print(f"Stopped early ({stop_reason}). Run the same command again to resume.")
+
+    cache_stats = video_cache.stats()
+    if cache_stats["bytes"] > 0.9 * cache_stats["max_bytes"]:
+        print("Warning: the video cache is close to VIDEO_CACHE_MAX_BYTES, pre-rendered videos may be evicted.")
+
+    coverage = report_coverage(matrix, scenarios)
+    sys.exit(0 if coverage == 1.0 else 1)
+
+
+if __name__ == "__main__":
+    main()
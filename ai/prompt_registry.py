@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import NamedTuple
+
+
+PROMPTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts.json")
+
+# Fält som får förekomma i prompterna, t.ex. "{age}-year-old {gender}"
+PROMPT_FIELDS = frozenset({"age", "gender"})
+PROMPT_TYPES = ("base_prompt", "ext_prompt")
+
+# Hur ofta prompts.json:s mtime kontrolleras (sekunder)
+RELOAD_CHECK_INTERVAL = float(os.getenv("PROMPTS_RELOAD_INTERVAL", "2"))
+
+_FIELD_RE = re.compile(r"\{([^{}]*)\}")
+
+
+class RenderedPrompts(NamedTuple):
+    base_prompt: str
+    ext_prompt: str
+    prompt_hash: str  # sha256 över de renderade prompterna, används som del av cache-nyckeln
+
+
+def prompt_hash(base_prompt: str, ext_prompt: str) -> str:
+    """Canonical hash of a rendered base/extension prompt pair."""
+
+    payload = json.dumps([base_prompt, ext_prompt], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PromptTemplate:
+    """A prompt split once into literal text and field names, rendered with a single join."""
+
+    __slots__ = ("parts", "fields")
+
+    def __init__(self, source: str, allowed_fields: frozenset = PROMPT_FIELDS):
+        # re.split med en grupp ger [text, fält, text, fält, ..., text]
+        self.parts = tuple(_FIELD_RE.split(source))
+        self.fields = frozenset(self.parts[1::2])
+
+        unknown = self.fields - allowed_fields
+        if unknown:
+            raise ValueError(f"Unknown placeholders {sorted(unknown)} (allowed: {sorted(allowed_fields)})")
+        if "{" in "".join(self.parts[0::2]) or "}" in "".join(self.parts[0::2]):
+            raise ValueError("Unbalanced '{' or '}' in prompt")
+
+    def render(self, values: dict) -> str:
+        parts = list(self.parts)
+        for i in range(1, len(parts), 2):
+            parts[i] = values[parts[i]]
+        return "".join(parts)
+
+
+class PromptRegistry:
+    """
+    Loads and validates prompts.json once and keeps compiled templates in memory.
+    The file's mtime is checked at most every check_interval seconds and a changed
+    file is reloaded; if the new file is invalid the previous prompts stay active.
+    Rendered prompt pairs are memoized per (scenario, age, gender).
+    """
+
+    def __init__(self, path: str = PROMPTS_PATH, check_interval: float = RELOAD_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self.version = 0
+        self._lock = threading.Lock()
+        self._templates: dict[int, dict[str, PromptTemplate]] = {}
+        self._rendered: dict[tuple, RenderedPrompts] = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._reload()
+
+    def _compile(self) -> dict:
+        with open(self.path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+
+        templates = {}
+        for scenario_key, scenario in data.items():
+            match = re.fullmatch(r"scenario_(\d+)", scenario_key)
+            if not match:
+                raise ValueError(f"Invalid scenario key {scenario_key!r} in {self.path}")
+            try:
+                templates[int(match.group(1))] = {
+                    prompt_type: PromptTemplate(scenario[prompt_type]) for prompt_type in PROMPT_TYPES
+                }
+            except KeyError as e:
+                raise ValueError(f"{scenario_key} is missing {e.args[0]}")
+            except ValueError as e:
+                raise ValueError(f"{scenario_key}: {e}")
+        return templates
+
+    def _reload(self) -> None:
+        mtime = os.stat(self.path).st_mtime_ns
+        templates = self._compile()
+        with self._lock:
+            self._templates = templates
+            self._rendered = {}
+            self._mtime = mtime
+            self.version += 1
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            if os.stat(self.path).st_mtime_ns != self._mtime:
+                self._reload()
+                print(f"Reloaded prompts from {self.path} (version {self.version})")
+        except (OSError, ValueError) as e:
+            print(f"Could not reload prompts, keeping version {self.version}: {e}")
+
+    def scenario_numbers(self) -> list[int]:
+        self._maybe_reload()
+        return sorted(self._templates)
+
+    def render(self, scenario_number: int, age, gender) -> RenderedPrompts:
+        """Renders base and extension prompt for a scenario, without file I/O."""
+
+        self._maybe_reload()
+        key = (scenario_number, str(age), str(gender))
+        rendered = self._rendered.get(key)
+        if rendered is not None:
+            return rendered
+
+        try:
+            templates = self._templates[scenario_number]
+        except KeyError:
+            raise KeyError(f"scenario_{scenario_number}")
+
+        values = {"age": key[1], "gender": key[2]}
+        base_prompt = templates["base_prompt"].render(values)
+        ext_prompt = templates["ext_prompt"].render(values)
+        rendered = RenderedPrompts(base_prompt, ext_prompt, prompt_hash(base_prompt, ext_prompt))
+
+        with self._lock:
+            # Antalet kombinationer är litet, men begränsa ändå minnet
+            if len(self._rendered) >= 4096:
+                self._rendered.clear()
+            self._rendered[key] = rendered
+        return rendered
+
+
+prompt_registry = PromptRegistry()
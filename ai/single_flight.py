@@ -0,0 +1,66 @@
+from concurrent.futures import Future
+
+import threading
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller (the leader)
+    runs the function and every caller that arrives while it is running waits
+    for and shares its result (or exception) instead of running it again.
+
+    do() blocks waiters on the leader's result. Callers that must not hold a
+    thread while waiting use join() and chain on the returned Future; the
+    leader then runs the function with run().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, Future] = {}
+        self._executions = 0
+        self._coalesced = 0
+
+    def join(self, key: str) -> tuple[Future, bool]:
+        """
+        Returns the shared Future for key and whether the caller is the leader.
+        Does not block. A leader must call run(key, future, fn, ...) exactly
+        once, otherwise the key stays in flight and its waiters never finish.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self._executions += 1
+            else:
+                self._coalesced += 1
+        return future, leader
+
+    def run(self, key: str, future: Future, fn, *args, **kwargs):
+        """Runs fn as the leader of key and hands its result (or exception) to every waiter."""
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def do(self, key: str, fn, *args, **kwargs):
+        future, leader = self.join(key)
+        if not leader:
+            return future.result()
+        return self.run(key, future, fn, *args, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executions": self._executions,
+                "coalesced": self._coalesced,
+            }
@@ -0,0 +1,123 @@
+from datetime import datetime
+from dotenv import load_dotenv
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from ai.video_cache import VIDEO_CACHE_DIR
+
+
+load_dotenv()
+
+# Tomt värde räknas som ej satt, annars blir indexets sökväg ""
+UPLOAD_CACHE_INDEX = os.getenv("UPLOAD_CACHE_INDEX") or os.path.join(VIDEO_CACHE_DIR, "uploads.json")
+# Filer API:t raderar uppladdningar efter 48 timmar
+UPLOAD_DEFAULT_TTL = 48 * 3600
+# Återanvänd inte en uppladdning som snart går ut
+UPLOAD_EXPIRY_MARGIN = float(os.getenv("UPLOAD_EXPIRY_MARGIN", "600"))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's content, read in chunks."""
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadCache:
+    """
+    Remembers which local files are already uploaded to the Files API, keyed
+    by content hash, with the returned URI and its expiry. The index is a
+    JSON file written atomically, so live uploads are reused across restarts
+    and a file is uploaded again only when its upload has (nearly) expired.
+    Hashes are memoized per (path, size, mtime) so an unchanged file is not
+    re-read on every call.
+    """
+
+    def __init__(self, index_path: str = UPLOAD_CACHE_INDEX, expiry_margin: float = UPLOAD_EXPIRY_MARGIN):
+        self.index_path = index_path
+        self.expiry_margin = expiry_margin
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] | None = None
+        self._digests: dict[tuple, str] = {}
+        self._hits = 0
+        self._uploads = 0
+
+    def digest(self, path: str) -> str:
+        stat = os.stat(path)
+        signature = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(signature)
+        if digest is None:
+            digest = file_digest(path)
+            self._digests[signature] = digest
+        return digest
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as file:
+                    self._entries = json.load(file)
+            except FileNotFoundError:
+                self._entries = {}
+            except ValueError:
+                print(f"Ignoring unreadable upload index {self.index_path}")
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        tmp_path = f"{self.index_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self._entries, file, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def get(self, digest: str) -> str | None:
+        """The URI of a live upload of this content, or None."""
+
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(digest)
+            if entry is None:
+                return None
+            if entry["expires_at"] - self.expiry_margin <= time.time():
+                del entries[digest]
+                self._save()
+                return None
+            self._hits += 1
+            return entry["uri"]
+
+    def put(self, digest: str, uri: str, name: str | None, expiration_time: datetime | None, size: int) -> None:
+        expires_at = expiration_time.timestamp() if expiration_time else time.time() + UPLOAD_DEFAULT_TTL
+        with self._lock:
+            entries = self._load()
+            entries[digest] = {
+                "uri": uri,
+                "name": name,
+                "expires_at": expires_at,
+                "size": size,
+            }
+            # Städa bort utgångna poster
+            now = time.time()
+            for key in [key for key, entry in entries.items() if entry["expires_at"] <= now]:
+                del entries[key]
+            self._uploads += 1
+            self._save()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._load()),
+                "hits": self._hits,
+                "uploads": self._uploads,
+            }
+
+
+upload_cache = UploadCache()
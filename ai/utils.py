@@ -1,25 +1,59 @@
 from google import genai
 from google.genai import types
-from google.genai.errors import ClientError
 
 import os
-import time
-from datetime import datetime
-import json
 
+from ai.veo_poller import veo_poller, VEO_POLL_TIMEOUT
+from ai.prompt_registry import prompt_registry
+from ai.genai_client import genai_clients
+from ai.upload_cache import upload_cache
+from ai.single_flight import SingleFlight
 
-def load_in_local_video(client: genai.Client,
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Samtidiga uppladdningar av samma fil görs en gång
+uploads = SingleFlight()
+
+
+def load_in_local_video(client: genai.Client | None,
                         video_path: str) -> types.Video:
 
+    # Utan egen klient lånas den delade
+    client = client or genai_clients.get()
+
+    # Samma innehåll laddas bara upp igen när den förra uppladdningen gått ut
+    digest = upload_cache.digest(video_path)
+    uri = upload_cache.get(digest) or uploads.do(digest, _upload_video, client, video_path, digest)
+
+    video = types.Video(
+        uri=uri
+    )
+
+    return video
+
+
+def _upload_video(client: genai.Client,
+                  video_path: str,
+                  digest: str) -> str:
+
+    uri = upload_cache.get(digest)
+    if uri:
+        return uri
+
     uploaded_file = client.files.upload(
         file=video_path
     )
 
-    video = types.Video(
-        uri=uploaded_file.uri
+    upload_cache.put(
+        digest,
+        uploaded_file.uri,
+        uploaded_file.name,
+        uploaded_file.expiration_time,
+        os.path.getsize(video_path)
     )
 
-    return video
+    return uploaded_file.uri
 
 
 def load_in_video_from_uri(video_uri: str) -> types.Video:
@@ -34,64 +68,64 @@ def load_in_video_from_uri(video_uri: str) -> types.Video:
 def poll_video(client: genai.Client,
                operation: types.GenerateVideosOperation,
                poll_interval: int = 10,
-               rate_limit_delay: int = 60) -> types.Video:
-
-    while True:
+               timeout: float = VEO_POLL_TIMEOUT) -> types.Video:
+
+    # Alla operationer pollas av den delade pollern så att rate limits respekteras för hela processen
+    print("Waiting for video generation to complete...")
+    future = veo_poller.submit(client, operation, initial_interval=poll_interval)
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        # Operationen sparas i video_operations och kan återupptas senare
+        veo_poller.forget(future)
+        raise TimeoutError(f"Video generation did not finish within {timeout:.0f}s")
+
+
+def download_video(video: types.Video,
+                   output_path: str,
+                   chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> int:
+    """
+    Streams a generated video to output_path chunk by chunk over the shared
+    connection pool, so the whole mp4 is never held in memory. The file is
+    fsynced before returning. Returns its size in bytes.
+    """
+
+    size = 0
+    try:
+        with open(output_path, "wb") as file:
+            if video.video_bytes:
+                # Vissa svar innehåller redan videon
+                file.write(video.video_bytes)
+                size = len(video.video_bytes)
+            else:
+                headers = {"x-goog-api-key": genai_clients.api_key or ""}
+                with genai_clients.http().stream("GET", video.uri, headers=headers, follow_redirects=True) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_bytes(chunk_size):
+                        file.write(chunk)
+                        size += len(chunk)
+            file.flush()
+            os.fsync(file.fileno())
+    except BaseException:
+        # Ingen halv fil får ligga kvar
         try:
-            while not operation.done:
-
-                print("Waiting for video generation to complete...")
-                time.sleep(poll_interval)
-                operation = client.operations.get(operation)
-
-            print("Finished generating video!")
-            return operation.response.generated_videos[0].video
-
-        except ClientError:
-            print("Rate limit hit — waiting 60s...")
-            time.sleep(rate_limit_delay)
-
-
-def save_video_locally(video: types.Video,
-                       save_dir: str) -> None:
-
-    os.makedirs(save_dir, exist_ok=True)
+            os.remove(output_path)
+        except FileNotFoundError:
+            pass
+        raise
 
-    todays_datetime = datetime.today().strftime("%Y_%m_%d_%H_%M_%S")
-
-    save_dir += "/" if not save_dir.endswith("/") else ""
-    output_file_name = f"{save_dir}video_{todays_datetime}.mp4"
-
-    video.save(path=output_file_name)
-
-    print("Video saved!")
+    return size
 
 
 def create_ai_prompt(user_info: dict,
                      scenario_number: int,
                      extended: bool = False) -> str:
 
-    age = user_info["age"]
-    gender = user_info["gender"]
-
-    scenario_key = f"scenario_{scenario_number}"
-
-    if extended:
-        prompt_type = "ext_prompt"
-    else:
-        prompt_type = "base_prompt"
-
-    # Hitta prompts.json relativt till denna fil (utils.py)
-    utils_dir = os.path.dirname(os.path.abspath(__file__))
-    prompts_path = os.path.join(utils_dir, "prompts.json")
-    
-    with open(prompts_path, "r") as file:
-        scenario = json.load(file)[scenario_key]
-
-    prompt = (
-        scenario[prompt_type]
-        .replace("{age}", age)
-        .replace("{gender}", gender)
+    # Prompterna läses och kompileras en gång i prompt_registry, ingen fil-I/O här
+    prompts = prompt_registry.render(
+        scenario_number,
+        user_info["age"],
+        user_info["gender"]
     )
 
-    return f"{prompt}"
+    return prompts.ext_prompt if extended else prompts.base_prompt
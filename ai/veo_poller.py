@@ -0,0 +1,299 @@
+from concurrent.futures import Future
+from google import genai
+from google.genai import types
+from google.genai.errors import ClientError
+from dotenv import load_dotenv
+
+import os
+import random
+import threading
+import time
+
+
+load_dotenv()
+
+# Gemensam pollbudget för hela processen (operations.get-anrop per sekund och burst)
+VEO_POLL_RATE = float(os.getenv("VEO_POLL_RATE", "1.0"))
+VEO_POLL_BURST = int(os.getenv("VEO_POLL_BURST", "5"))
+# Intervall per operation, växer från min till max medan operationen pågår
+VEO_POLL_MIN_INTERVAL = float(os.getenv("VEO_POLL_MIN_INTERVAL", "10"))
+VEO_POLL_MAX_INTERVAL = float(os.getenv("VEO_POLL_MAX_INTERVAL", "30"))
+VEO_POLL_BATCH_SIZE = int(os.getenv("VEO_POLL_BATCH_SIZE", "10"))
+# Exponentiell backoff med jitter när API:t svarar med rate limit
+VEO_BACKOFF_BASE = float(os.getenv("VEO_BACKOFF_BASE", "5"))
+VEO_BACKOFF_MAX = float(os.getenv("VEO_BACKOFF_MAX", "120"))
+VEO_MAX_POLL_ERRORS = int(os.getenv("VEO_MAX_POLL_ERRORS", "5"))
+# Längsta tid en anropare väntar på en operation innan den ger upp (sekunder)
+VEO_POLL_TIMEOUT = float(os.getenv("VEO_POLL_TIMEOUT", "3600"))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: rate tokens per second, at most capacity stored."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def time_until_token(self) -> float:
+        with self._lock:
+            missing = 1 - self._tokens
+            return max(missing / self.rate, 0.0) if self.rate > 0 else VEO_POLL_MAX_INTERVAL
+
+
+def _is_rate_limit(error: ClientError) -> bool:
+    return getattr(error, "code", None) == 429 or "RESOURCE_EXHAUSTED" in str(error)
+
+
+class VeoPollerStopped(RuntimeError):
+    """The poller was stopped (or its thread died) before the operation finished."""
+
+
+class VideoOperationFailed(RuntimeError):
+    """Veo finished the operation without a video; polling it again gives the same answer."""
+
+
+def is_terminal_error(error: BaseException) -> bool:
+    """
+    True when the operation itself is gone or failed (Veo reported an error, or
+    a 4xx other than rate limiting), False for network errors, 5xx and the like
+    where the same operation can still be polled later.
+    """
+    if isinstance(error, VideoOperationFailed):
+        return True
+    return isinstance(error, ClientError) and not _is_rate_limit(error)
+
+
+class _TrackedOperation:
+    __slots__ = ("operation", "client", "future", "interval", "next_poll_at", "errors")
+
+    def __init__(self, client: genai.Client, operation: types.GenerateVideosOperation, interval: float):
+        self.client = client
+        self.operation = operation
+        self.future: Future = Future()
+        self.interval = interval
+        self.next_poll_at = time.monotonic() + interval
+        self.errors = 0
+
+
+class VeoPoller:
+    """
+    One background thread that polls every outstanding GenerateVideosOperation
+    in the process. Polls are spent from a shared token bucket, each operation's
+    interval grows while it runs and with the number of outstanding operations,
+    and a rate-limit answer pauses all polling with exponential backoff and jitter.
+    Callers get a Future that resolves to the generated types.Video.
+    """
+
+    def __init__(self,
+                 rate: float = VEO_POLL_RATE,
+                 burst: int = VEO_POLL_BURST,
+                 min_interval: float = VEO_POLL_MIN_INTERVAL,
+                 max_interval: float = VEO_POLL_MAX_INTERVAL,
+                 batch_size: int = VEO_POLL_BATCH_SIZE):
+        self.bucket = TokenBucket(rate, burst)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.batch_size = batch_size
+        self._tracked: list[_TrackedOperation] = []
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+        self._backoff_until = 0.0
+        self._rate_limit_streak = 0
+        self._polls = 0
+        self._rate_limited = 0
+        self._completed = 0
+        self._failed = 0
+
+    def submit(self,
+               client: genai.Client,
+               operation: types.GenerateVideosOperation,
+               initial_interval: float | None = None) -> Future:
+
+        tracked = _TrackedOperation(client, operation, initial_interval or self.min_interval)
+        with self._cond:
+            if self._stopped:
+                raise VeoPollerStopped("Veo poller is stopped")
+        if operation.done:
+            self._resolve(tracked)
+            return tracked.future
+
+        with self._cond:
+            self._tracked.append(tracked)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="veo-poller", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return tracked.future
+
+    def forget(self, future: Future) -> None:
+        """Stops polling the operation behind future, e.g. when its caller gave up waiting."""
+
+        with self._cond:
+            self._tracked = [t for t in self._tracked if t.future is not future]
+
+    def _resolve(self, tracked: _TrackedOperation) -> None:
+        operation = tracked.operation
+        if operation.error:
+            error = VideoOperationFailed(f"Video generation failed: {operation.error}")
+        elif not operation.response or not operation.response.generated_videos:
+            error = VideoOperationFailed("Video generation returned no video")
+        else:
+            error = None
+
+        with self._cond:
+            if error:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+        if error:
+            tracked.future.set_exception(error)
+        else:
+            tracked.future.set_result(operation.response.generated_videos[0].video)
+
+    def _due(self, now: float) -> list:
+        due = [t for t in self._tracked if t.next_poll_at <= now]
+        due.sort(key=lambda t: t.next_poll_at)
+        return due[:self.batch_size]
+
+    def _run(self) -> None:
+        try:
+            self._loop()
+        except BaseException as e:
+            print(f"Veo poller stopped unexpectedly: {e!r}")
+            raise
+        finally:
+            # Ingen anropare får vänta på en operation som ingen längre pollar
+            self._fail_all(VeoPollerStopped("Veo poller stopped before the operation finished"))
+
+    def _untrack(self, tracked: _TrackedOperation) -> bool:
+        """Removes tracked. False if it was already removed (and its future settled)."""
+
+        with self._cond:
+            if tracked not in self._tracked:
+                return False
+            self._tracked.remove(tracked)
+            return True
+
+    def _fail_all(self, error: Exception) -> None:
+        with self._cond:
+            tracked, self._tracked = self._tracked, []
+            self._failed += len(tracked)
+        for t in tracked:
+            if not t.future.done():
+                t.future.set_exception(error)
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopped and not self._tracked:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+
+                now = time.monotonic()
+                wait = self._backoff_until - now
+                if wait <= 0:
+                    due = self._due(now)
+                    if not due:
+                        wait = min(t.next_poll_at for t in self._tracked) - now
+                if wait > 0:
+                    self._cond.wait(timeout=wait)
+                    continue
+
+            for tracked in due:
+                if not self.bucket.try_acquire():
+                    # Budgeten är slut, resten pollas när nästa token finns
+                    time.sleep(self.bucket.time_until_token())
+                    break
+                if not self._poll(tracked):
+                    break
+
+    def _poll(self, tracked: _TrackedOperation) -> bool:
+        """Polls one operation. Returns False when polling should pause (rate limited)."""
+
+        now = time.monotonic()
+        try:
+            tracked.operation = tracked.client.operations.get(tracked.operation)
+        except ClientError as e:
+            if _is_rate_limit(e):
+                self._rate_limited += 1
+                self._rate_limit_streak += 1
+                delay = min(VEO_BACKOFF_MAX, VEO_BACKOFF_BASE * 2 ** (self._rate_limit_streak - 1))
+                delay = delay / 2 + random.uniform(0, delay / 2)
+                print(f"Rate limit hit — pausing all polling for {delay:.0f}s...")
+                with self._cond:
+                    self._backoff_until = now + delay
+                return False
+            self._poll_failed(tracked, e, now)
+            return True
+        except Exception as e:
+            self._poll_failed(tracked, e, now)
+            return True
+        finally:
+            self._polls += 1
+
+        self._rate_limit_streak = 0
+        tracked.errors = 0
+
+        if tracked.operation.done:
+            # Kan ha släppts (stop/forget) medan anropet pågick
+            if not self._untrack(tracked):
+                return True
+            print("Finished generating video!")
+            self._resolve(tracked)
+            return True
+
+        # Glesare pollning ju längre operationen pågått och ju fler som väntar
+        with self._cond:
+            load_interval = len(self._tracked) / self.bucket.rate if self.bucket.rate > 0 else 0
+        tracked.interval = min(self.max_interval, max(tracked.interval * 1.5, load_interval))
+        tracked.next_poll_at = now + tracked.interval
+        return True
+
+    def _poll_failed(self, tracked: _TrackedOperation, error: Exception, now: float) -> None:
+        tracked.errors += 1
+        if tracked.errors >= VEO_MAX_POLL_ERRORS:
+            if self._untrack(tracked):
+                with self._cond:
+                    self._failed += 1
+                tracked.future.set_exception(error)
+            return
+        delay = min(self.max_interval, self.min_interval * 2 ** tracked.errors)
+        tracked.next_poll_at = now + delay / 2 + random.uniform(0, delay / 2)
+
+    def stop(self) -> None:
+        """Stops polling and fails every outstanding future; later submits are rejected."""
+
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._fail_all(VeoPollerStopped("Veo poller stopped before the operation finished"))
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "outstanding": len(self._tracked),
+                "polls": self._polls,
+                "rate_limited": self._rate_limited,
+                "backoff_remaining_seconds": max(self._backoff_until - time.monotonic(), 0.0),
+                "completed": self._completed,
+                "failed": self._failed,
+            }
+
+
+veo_poller = VeoPoller()
@@ -0,0 +1,150 @@
+from abc import ABC, abstractmethod
+from dotenv import load_dotenv
+
+import glob
+import hashlib
+import os
+import random
+import shutil
+import threading
+import time
+
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCK_DATA_DIR = os.path.join(PROJECT_ROOT, "mock_data")
+
+
+def missing_video_info(quota_exceeded: bool = False) -> dict:
+    """The result returned when no video could be generated."""
+    return {
+        "video_path": "",
+        "size": 0,
+        "uri": "",
+        "locally_downloaded": False,
+        "pause_at_seconds": 0,
+        "video_exists": False,
+        "quota_exceeded": quota_exceeded
+    }
+
+
+class VideoBackend(ABC):
+    """
+    Interface for whatever generates the base + extension video pair.
+
+    generate() writes the video to output_path (a temporary file in the video
+    cache) and returns the same dict as ai.video_generation._generate_video:
+    video_path, size, uri, locally_downloaded, pause_at_seconds and video_exists.
+    `model` is part of the video cache key, so videos from different backends
+    never share cache entries. cache_key identifies the video being generated,
+    so a backend can pick up work it started for the same key earlier.
+    """
+
+    name = "base"
+    model = ""
+
+    @abstractmethod
+    def generate(self,
+                 base_prompt: str,
+                 ext_prompt: str,
+                 output_path: str,
+                 cache_key: str = "") -> dict:
+        ...
+
+
+def _parse_latency(spec: str):
+    """
+    Parses a latency distribution such as "fixed:5", "uniform:5,30",
+    "normal:30,10" or "lognormal:3.3,0.4" into a function rng -> seconds.
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()]
+
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(rng.gauss(values[0], values[1]), 0.0)
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Invalid latency distribution: {spec!r}")
+
+
+class MockVideoBackend(VideoBackend):
+    """
+    Offline stand-in for Veo that returns the videos in mock_data/ after a
+    simulated generation time. Latency, error rate and quota rate are
+    configurable and the random source is seeded, so queueing, caching and
+    prefetch behaviour can be measured without network access.
+    """
+
+    name = "mock"
+    model = "mock-veo"
+
+    def __init__(self,
+                 latency: str = "normal:30,10",
+                 error_rate: float = 0.0,
+                 quota_rate: float = 0.0,
+                 seed: int | None = None,
+                 video_dir: str = MOCK_DATA_DIR,
+                 pause_at_seconds: int = 8):
+        self.latency_spec = latency
+        self._latency = _parse_latency(latency)
+        self.error_rate = error_rate
+        self.quota_rate = quota_rate
+        self.pause_at_seconds = pause_at_seconds
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._videos = sorted(glob.glob(os.path.join(video_dir, "video*.mp4")))
+        if not self._videos:
+            raise FileNotFoundError(f"No mock videos (video*.mp4) found in {video_dir}")
+
+    @classmethod
+    def from_env(cls) -> "MockVideoBackend":
+        seed = os.getenv("MOCK_VEO_SEED")
+        return cls(
+            latency=os.getenv("MOCK_VEO_LATENCY", "normal:30,10"),
+            error_rate=float(os.getenv("MOCK_VEO_ERROR_RATE", "0")),
+            quota_rate=float(os.getenv("MOCK_VEO_QUOTA_RATE", "0")),
+            seed=int(seed) if seed else None
+        )
+
+    def generate(self,
+                 base_prompt: str,
+                 ext_prompt: str,
+                 output_path: str,
+                 cache_key: str = "") -> dict:
+
+        with self._rng_lock:
+            outcome = self._rng.random()
+            latency = self._latency(self._rng)
+
+        # Kvoten tar slut direkt när operationen skapas, precis som hos Veo
+        if outcome < self.quota_rate:
+            print("Current video generation quota is exceeded! Can't generate more videos right now!")
+            return missing_video_info(quota_exceeded=True)
+
+        time.sleep(latency)
+
+        if outcome < self.quota_rate + self.error_rate:
+            raise RuntimeError("Mock video generation failed")
+
+        # Samma prompter ger alltid samma mock-video
+        digest = hashlib.sha256(f"{base_prompt}\n{ext_prompt}".encode("utf-8")).digest()
+        path = self._videos[digest[0] % len(self._videos)]
+        # Kopieras i block, precis som den strömmade nedladdningen från Veo
+        with open(path, "rb") as source, open(output_path, "wb") as file:
+            shutil.copyfileobj(source, file, 1024 * 1024)
+            file.flush()
+            os.fsync(file.fileno())
+
+        return {
+            "video_path": output_path,
+            "size": os.path.getsize(output_path),
+            "uri": f"mock://{os.path.basename(path)}",
+            "locally_downloaded": True,
+            "pause_at_seconds": self.pause_at_seconds,
+            "video_exists": True
+        }
@@ -0,0 +1,222 @@
+from dotenv import load_dotenv
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+load_dotenv()
+
+# Cachen ligger i projektets root om inget annat anges
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VIDEO_CACHE_DIR = os.getenv("VIDEO_CACHE_DIR", os.path.join(PROJECT_ROOT, "video_cache"))
+VIDEO_CACHE_MAX_BYTES = int(os.getenv("VIDEO_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+
+# URL där cachens videor serveras (se game/gameWebb.py)
+VIDEO_MEDIA_URL = "/media/videos"
+
+
+def video_cache_key(model: str,
+                    resolution: str,
+                    duration_seconds: int,
+                    prompt_hash: str) -> str:
+    """
+    Content address for a generated video: sha256 over everything that decides its content.
+    prompt_hash is the canonical hash of the rendered prompts (ai.prompt_registry.prompt_hash).
+    """
+
+    payload = json.dumps(
+        [model, resolution, duration_seconds, prompt_hash],
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class VideoCache:
+    """
+    On-disk cache of generated videos. Each entry is <key>.mp4 plus <key>.json
+    with its metadata. Last access is kept as the mp4's atime so it survives
+    restarts, and entries are evicted least recently used first once the
+    cache grows past max_bytes.
+    """
+
+    def __init__(self,
+                 root: str = VIDEO_CACHE_DIR,
+                 max_bytes: int = VIDEO_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> [size, last_access], laddas från disk vid första användning
+        self._index: dict[str, list] | None = None
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._evict_listeners = []
+
+    def on_evict(self, listener) -> None:
+        """Calls listener(key) whenever an entry is evicted, e.g. to remove derived files."""
+        self._evict_listeners.append(listener)
+
+    def video_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.mp4")
+
+    def video_url(self, key: str) -> str:
+        return f"{VIDEO_MEDIA_URL}/{key}.mp4"
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def _load_index(self) -> dict:
+        if self._index is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._index = {}
+            stale_before = time.time() - 3600
+            for name in os.listdir(self.root):
+                key, ext = os.path.splitext(name)
+                if ext == ".tmp":
+                    # Rester från avbrutna nedladdningar
+                    tmp_path = os.path.join(self.root, name)
+                    try:
+                        if os.stat(tmp_path).st_mtime < stale_before:
+                            os.remove(tmp_path)
+                    except OSError:
+                        pass
+                    continue
+                if ext != ".mp4" or not os.path.exists(self._meta_path(key)):
+                    continue
+                stat = os.stat(os.path.join(self.root, name))
+                self._index[key] = [stat.st_size, stat.st_atime]
+            self._total_bytes = sum(size for size, _ in self._index.values())
+        return self._index
+
+    def contains(self, key: str) -> bool:
+        """Whether the key is cached, without touching hit/miss stats or access time."""
+
+        with self._lock:
+            return key in self._load_index()
+
+    def get(self, key: str) -> dict | None:
+        """Returns the entry's metadata (with 'path') on a hit, None on a miss."""
+
+        with self._lock:
+            index = self._load_index()
+            entry = index.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            try:
+                with open(self._meta_path(key), "r", encoding="utf-8") as file:
+                    metadata = json.load(file)
+                now = time.time()
+                path = self.video_path(key)
+                os.utime(path, (now, os.stat(path).st_mtime))
+            except (OSError, ValueError):
+                # Trasig eller borttagen post räknas som miss
+                self._forget(key)
+                self._misses += 1
+                return None
+
+            entry[1] = now
+            self._hits += 1
+
+        metadata["path"] = path
+        metadata["url"] = self.video_url(key)
+        return metadata
+
+    def temp_path(self, key: str) -> str:
+        """A private file in the cache directory to write a video for key into before put_file()."""
+
+        os.makedirs(self.root, exist_ok=True)
+        return os.path.join(self.root, f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    def put_file(self, key: str, tmp_path: str, metadata: dict) -> dict:
+        """
+        Moves a finished (and fsynced) file from temp_path() into the cache with an
+        atomic rename and evicts old entries if the cache is over budget.
+        """
+
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            index = self._load_index()
+            path = self.video_path(key)
+
+            metadata = dict(metadata, key=key, size=size, created_at=time.time())
+            os.replace(tmp_path, path)
+
+            tmp_meta = f"{self._meta_path(key)}.{threading.get_ident()}.tmp"
+            with open(tmp_meta, "w", encoding="utf-8") as file:
+                json.dump(metadata, file, ensure_ascii=False)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_meta, self._meta_path(key))
+            self._fsync_dir()
+
+            if key in index:
+                self._total_bytes -= index[key][0]
+            index[key] = [size, time.time()]
+            self._total_bytes += size
+
+            self._evict(keep=key)
+
+        metadata["path"] = path
+        metadata["url"] = self.video_url(key)
+        return metadata
+
+    def _fsync_dir(self) -> None:
+        # Gör själva namnbytena beständiga
+        try:
+            fd = os.open(self.root, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def _forget(self, key: str) -> None:
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[0]
+        for path in (self.video_path(key), self._meta_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self, keep: str | None = None) -> None:
+        if self._total_bytes <= self.max_bytes:
+            return
+        # Minst nyligen använda först
+        for key, _ in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._forget(key)
+            self._evictions += 1
+            for listener in self._evict_listeners:
+                listener(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            index = self._load_index()
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+            }
+
+
+video_cache = VideoCache()
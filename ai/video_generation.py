@@ -5,70 +5,101 @@ from dotenv import load_dotenv
 
 import os
 
-from ai.utils import create_ai_prompt, save_video_locally, poll_video
+from ai.utils import download_video, poll_video
+from ai.veo_poller import is_terminal_error
+from ai.prompt_registry import prompt_registry, prompt_hash, RenderedPrompts
+from ai.video_cache import video_cache, video_cache_key
+from ai.single_flight import SingleFlight
+from ai.genai_client import genai_clients
+from ai.demographics import demographic_buckets, PromptVariant
+from ai.video_backends import VideoBackend, MockVideoBackend, missing_video_info
+from ai.video_renditions import video_renditions
+from ai.video_operations import video_operations, PendingOperation, STAGE_BASE, STAGE_EXTENSION
 
 
 load_dotenv()
 
+VIDEO_MODEL = "veo-3.1-generate-preview"
+VIDEO_RESOLUTION = "720p"
+BASE_VIDEO_DURATION = 8  # seconds
+
+# Delas av alla trådar i processen, nyckeln är videons cache-nyckel
+video_generations = SingleFlight()
+
+# HLS-renditionerna hör till cacheposten och försvinner med den
+video_cache.on_evict(video_renditions.remove)
+
 
 def _generate_video(client: genai.Client,
                     base_prompt: str,
                     ext_prompt: str,
-                    local_download_folder: str | None = None) -> dict:
-
-    base_video_duration = 8  # seconds
+                    output_path: str,
+                    cache_key: str = "",
+                    resume: PendingOperation | None = None) -> dict:
+
+    base_video_duration = BASE_VIDEO_DURATION
+
+    def track(operation: types.GenerateVideosOperation, stage: str) -> None:
+        # Startade operationer sparas så att de kan återupptas efter en omstart
+        if cache_key:
+            video_operations.record(
+                cache_key,
+                operation.name,
+                stage,
+                prompt_hash(base_prompt, ext_prompt),
+                base_prompt,
+                ext_prompt
+            )
 
     try:
-        # Generate base video
-        base_operation = client.models.generate_videos(
-            model="veo-3.1-generate-preview",
-            prompt=base_prompt,
-            config=types.GenerateVideosConfig(
-                number_of_videos=1,
-                resolution="720p",
-                duration_seconds=base_video_duration
-            )
-        )
-        generated_base_video: types.Video = poll_video(client, base_operation)
-
-        # Generate extended video
-        ext_operation = client.models.generate_videos(
-            model="veo-3.1-generate-preview",
-            video=generated_base_video,
-            prompt=ext_prompt,
-            config=types.GenerateVideosConfig(
-                number_of_videos=1,
-                resolution="720p"
+        if resume and resume.stage == STAGE_EXTENSION:
+            ext_operation = types.GenerateVideosOperation(name=resume.operation_name)
+        else:
+            if resume:
+                base_operation = types.GenerateVideosOperation(name=resume.operation_name)
+            else:
+                # Generate base video
+                base_operation = client.models.generate_videos(
+                    model=VIDEO_MODEL,
+                    prompt=base_prompt,
+                    config=types.GenerateVideosConfig(
+                        number_of_videos=1,
+                        resolution=VIDEO_RESOLUTION,
+                        duration_seconds=base_video_duration
+                    )
+                )
+                track(base_operation, STAGE_BASE)
+            generated_base_video: types.Video = poll_video(client, base_operation)
+
+            # Generate extended video
+            ext_operation = client.models.generate_videos(
+                model=VIDEO_MODEL,
+                video=generated_base_video,
+                prompt=ext_prompt,
+                config=types.GenerateVideosConfig(
+                    number_of_videos=1,
+                    resolution=VIDEO_RESOLUTION
+                )
             )
-        )
+            track(ext_operation, STAGE_EXTENSION)
     except ClientError as e:
         if "RESOURCE_EXHAUSTED" in str(e):
             print("Current video generation quota is exceeded! Can't generate more videos right now!")
-        else:
-            print(e)
-
-        client.close()
+            return missing_video_info(quota_exceeded=True)
 
-        return {
-            "video_bytes": b"",
-            "uri": "",
-            "locally_downloaded": False,
-            "pause_at_seconds": 0,
-            "video_exists": False
-        }
+        print(e)
+        return missing_video_info()
 
     generated_extended_video: types.Video = poll_video(client, ext_operation)
 
-    # Download video to Google
-    video_bytes = client.files.download(file=generated_extended_video)
-
-    if local_download_folder:
-        save_video_locally(generated_extended_video, local_download_folder)
+    # Strömmas direkt till output_path, videon hålls aldrig i minnet
+    size = download_video(generated_extended_video, output_path)
 
     video_info = {
-        "video_bytes": video_bytes,
+        "video_path": output_path,
+        "size": size,
         "uri": generated_extended_video.uri,
-        "locally_downloaded": True if local_download_folder else False,
+        "locally_downloaded": True,
         "pause_at_seconds": base_video_duration,
         "video_exists": True
     }
@@ -76,48 +107,214 @@ def _generate_video(client: genai.Client,
     return video_info
 
 
-def get_video(user_info: dict,
-              scenario_number: int,
-              video_folder: str | None = None):
+class VeoBackend(VideoBackend):
+    """Live generation with Veo through the Gemini API."""
 
-    try:
-        client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-    except ValueError:
-        print("Couldn't connect to Google-Gemini! Check your API key!")
-        return {
-            "video_bytes": b"",
-            "uri": "",
-            "locally_downloaded": False,
-            "pause_at_seconds": 0,
-            "video_exists": False
-        }
-
-    base_prompt = create_ai_prompt(
-        user_info=user_info,
-        scenario_number=scenario_number
+    name = "veo"
+    model = VIDEO_MODEL
+
+    def generate(self,
+                 base_prompt: str,
+                 ext_prompt: str,
+                 output_path: str,
+                 cache_key: str = "") -> dict:
+
+        try:
+            genai_clients.get()
+        except ValueError:
+            print("Couldn't connect to Google-Gemini! Check your API key!")
+            return missing_video_info()
+
+        # Den delade klienten återanvänder sina connections och stängs först vid avstängning
+        # En operation som redan startats för samma video (t.ex. före en omstart) pollas vidare
+        resume = video_operations.get(cache_key) if cache_key else None
+        if resume:
+            print(f"Resuming {resume.stage} operation {resume.operation_name}...")
+
+        with genai_clients.borrow() as client:
+            return _generate_video(client, base_prompt, ext_prompt, output_path, cache_key, resume)
+
+
+def create_video_backend(name: str | None = None) -> VideoBackend:
+    """Väljer backend med VIDEO_BACKEND (veo eller mock), veo som standard."""
+
+    name = (name or os.getenv("VIDEO_BACKEND", "veo")).strip().lower()
+    if name == "mock":
+        return MockVideoBackend.from_env()
+    if name == "veo":
+        return VeoBackend()
+    raise ValueError(f"Unknown VIDEO_BACKEND: {name!r} (expected 'veo' or 'mock')")
+
+
+video_backend = create_video_backend()
+
+
+def resolve_video_key(user_info: dict, scenario_number: int) -> tuple[PromptVariant, RenderedPrompts, str]:
+    """
+    The player's demographic bucket, the prompts rendered for it and the cache
+    key of the resulting video.
+    """
+
+    # Spelare i samma åldersband och med samma kön delar video
+    variant = demographic_buckets.variant(user_info)
+    prompts = prompt_registry.render(
+        scenario_number,
+        variant.age,
+        variant.gender
     )
 
-    extended_prompt = create_ai_prompt(
-        user_info=user_info,
-        scenario_number=scenario_number,
-        extended=True
+    # Samma prompter ger samma video, så en träff i cachen hoppar över genereringen helt
+    cache_key = video_cache_key(
+        video_backend.model,
+        VIDEO_RESOLUTION,
+        BASE_VIDEO_DURATION,
+        prompts.prompt_hash
     )
+    return variant, prompts, cache_key
+
+
+def lookup_video(user_info: dict, scenario_number: int) -> tuple[str, RenderedPrompts, dict | None]:
+    """
+    The cache key and prompts of the player's video, and its video_info if it
+    is already cached (None on a miss). Only reads the cache, never generates.
+    """
+
+    variant, prompts, cache_key = resolve_video_key(user_info, scenario_number)
+
+    cached = video_cache.get(cache_key)
+    demographic_buckets.record(variant.bucket, hit=cached is not None)
+    if not cached:
+        return cache_key, prompts, None
+
+    # Videor som cachats innan HLS fanns (eller vars transkodning misslyckats) får renditioner nu
+    video_renditions.ensure(cache_key, cached["path"])
+    return cache_key, prompts, {
+        "url": cached["url"],
+        "uri": cached.get("uri", ""),
+        "locally_downloaded": True,
+        "pause_at_seconds": cached.get("pause_at_seconds", BASE_VIDEO_DURATION),
+        "video_exists": True,
+        "cache_key": cache_key,
+        "path": cached["path"]
+    }
+
 
-    video_info = _generate_video(
-        client,
-        base_prompt,
-        extended_prompt,
-        video_folder
+def get_video(user_info: dict,
+              scenario_number: int):
+
+    cache_key, prompts, video_info = lookup_video(user_info, scenario_number)
+    if video_info is not None:
+        return video_info
+
+    # Samtidiga förfrågningar med samma prompter väntar på en och samma generering
+    video_info = video_generations.do(
+        cache_key,
+        generate_and_cache,
+        cache_key,
+        prompts.base_prompt,
+        prompts.ext_prompt
     )
 
-    client.close()
+    return dict(video_info)
+
+
+def generate_and_cache(cache_key: str,
+                       base_prompt: str,
+                       extended_prompt: str) -> dict:
+    """Generates the video for cache_key and stores it in the cache. Run it through video_generations."""
+
+    # Backenden skriver videon till en temporär fil i cachen som sedan döps om atomiskt
+    output_path = video_cache.temp_path(cache_key)
+    try:
+        video_info = video_backend.generate(
+            base_prompt,
+            extended_prompt,
+            output_path,
+            cache_key=cache_key
+        )
+    except Exception as e:
+        # Bara en operation som Veo själv underkänt släpps, vid nätverksfel o.d. kan den återupptas
+        if is_terminal_error(e):
+            video_operations.discard(cache_key)
+        _remove_quietly(output_path)
+        raise
+
+    video_path = video_info.pop("video_path")
+    video_info["url"] = ""
+
+    if not video_info["video_exists"]:
+        _remove_quietly(output_path)
+    else:
+        entry = video_cache.put_file(cache_key, video_path, {
+            "backend": video_backend.name,
+            "model": video_backend.model,
+            "resolution": VIDEO_RESOLUTION,
+            "duration_seconds": BASE_VIDEO_DURATION,
+            "base_prompt": base_prompt,
+            "ext_prompt": extended_prompt,
+            "prompt_hash": prompt_hash(base_prompt, extended_prompt),
+            "uri": video_info["uri"],
+            "pause_at_seconds": video_info["pause_at_seconds"]
+        })
+        video_info["cache_key"] = cache_key
+        video_info["path"] = entry["path"]
+        video_info["url"] = entry["url"]
+        # HLS-stege och poster tas fram i bakgrunden, mp4:an kan spelas direkt
+        video_renditions.ensure(cache_key, entry["path"])
+
+    # Vid slut på kvot behålls en påbörjad operation så att den kan fortsätta senare
+    if not video_info.get("quota_exceeded"):
+        video_operations.discard(cache_key)
 
     return video_info
 
 
-if __name__ == "__main__":
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def resume_video_operations() -> int:
+    """
+    Re-attaches Veo operations left over from a previous run to the poller.
+    Each one is queued as a video generation (same workers and queue limit as
+    players' jobs) and its video lands in the cache. An operation whose video
+    a player is already generating doesn't take a worker of its own. Returns
+    the number of resumed operations.
+    """
+
+    pending = video_operations.pending()
+    if not pending:
+        return 0
+    if not isinstance(video_backend, VeoBackend):
+        print(f"{len(pending)} unfinished Veo operations kept, VIDEO_BACKEND is {video_backend.name}")
+        return 0
+
+    # Återupptagningarna delar arbetartrådar och kö med övriga videojobb
+    from ai.video_jobs import video_jobs
+
+    resumed = 0
+    for operation in pending:
+        if video_cache.contains(operation.cache_key):
+            video_operations.discard(operation.cache_key)
+            continue
+        job = video_jobs.submit_generation(
+            operation.cache_key,
+            operation.base_prompt,
+            operation.ext_prompt
+        )
+        if job is None:
+            print(f"Video job queue is full - {len(pending) - resumed} operations are resumed after the next restart")
+            break
+        resumed += 1
+
+    print(f"Resuming {resumed} unfinished video generations...")
+    return resumed
 
-    video_folder = "videos/"
+
+if __name__ == "__main__":
 
     user_info = {
         "strategy": "stay",
@@ -136,16 +333,19 @@ if __name__ == "__main__":
     for i in range(2):
         video = get_video(
             user_info,
-            i+1,
-            video_folder
+            i+1
         )
 
-        #print(video["video_bytes"])
+        if not video["video_exists"]:
+            reason = "quota exceeded" if video.get("quota_exceeded") else "generation failed"
+            print(f"Scenario {i+1}: no video ({reason})")
+            continue
+
+        print(video["url"])
+        print(video["path"])
         print(video["uri"])
         print(video["locally_downloaded"])
         print(video["pause_at_seconds"])
 
     # taktisk, logisk, lojal, omtänksam, riskbenägen, försiktig, pragmatisk, moralisk
 
-    #import base64
-    #source = f"data:video/mp4;base64,{base64.b64encode(video["video_bytes"]).decode()}"
@@ -0,0 +1,200 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from dotenv import load_dotenv
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+
+from ai.video_generation import lookup_video, generate_and_cache, video_generations
+
+
+load_dotenv()
+
+# Max antal videor som genereras samtidigt och max antal som får vänta i kö
+VIDEO_JOB_WORKERS = int(os.getenv("VIDEO_JOB_WORKERS", "4"))
+VIDEO_JOB_MAX_QUEUE = int(os.getenv("VIDEO_JOB_MAX_QUEUE", "100"))
+
+
+class VideoJob:
+    """Handle for one requested video. The result is get_video's video_info dict."""
+
+    def __init__(self, job_id: int, scenario_number: int):
+        self.job_id = job_id
+        self.scenario_number = scenario_number
+        self.status = "queued"
+        self.future: Future = Future()
+        self.submitted_at = time.monotonic()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout: float | None = None) -> dict:
+        return self.future.result(timeout)
+
+    async def wait(self) -> dict:
+        """Awaitable result, for use from the NiceGUI event loop."""
+        return await asyncio.wrap_future(self.future)
+
+
+class VideoJobQueue:
+    """
+    Runs video generation on a bounded thread pool so the event loop never
+    blocks on generation or polling. submit() returns a VideoJob immediately,
+    or None when the queue is full so the caller can stay on the fallback video.
+
+    Only the job that actually generates a video takes a worker: cache hits
+    come back as finished jobs and jobs for a video that is already being
+    generated wait on that generation's Future in video_generations.
+    """
+
+    def __init__(self,
+                 max_workers: int = VIDEO_JOB_WORKERS,
+                 max_queue: int = VIDEO_JOB_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="video-job")
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._queued = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._cache_hits = 0
+        self._coalesced = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def submit(self,
+               user_info: dict,
+               scenario_number: int) -> VideoJob | None:
+
+        try:
+            cache_key, prompts, video_info = lookup_video(dict(user_info), scenario_number)
+        except Exception as e:
+            print(f"Video for scenario {scenario_number} failed: {e}")
+            return self._finished_job(scenario_number, exception=e)
+
+        if video_info is not None:
+            with self._lock:
+                self._cache_hits += 1
+            return self._finished_job(scenario_number, video_info)
+
+        return self.submit_generation(cache_key, prompts.base_prompt, prompts.ext_prompt,
+                                      scenario_number, "using fallback video")
+
+    def submit_generation(self,
+                          cache_key: str,
+                          base_prompt: str,
+                          ext_prompt: str,
+                          scenario_number: int = 0,
+                          rejected_note: str = "try again later") -> VideoJob | None:
+        """
+        Generates the video for cache_key, or joins the generation already
+        running for it. Also used for resumed Veo operations.
+        """
+
+        # Platsen i kön reserveras före join() så att en ledare aldrig blir utan arbetare
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._rejected += 1
+                print(f"Video job queue is full ({self._queued} waiting) - {rejected_note}")
+                return None
+            self._queued += 1
+            self._submitted += 1
+            job = VideoJob(next(self._ids), scenario_number)
+
+        shared, leader = video_generations.join(cache_key)
+        if not leader:
+            # Samma video genereras redan, vänta på den utan att ta en arbetartråd
+            with self._lock:
+                self._queued -= 1
+                self._coalesced += 1
+            job.status = "waiting"
+            shared.add_done_callback(lambda future: self._chain(job, future))
+            return job
+
+        self._executor.submit(self._run, job, video_generations.run,
+                              (cache_key, shared, generate_and_cache, cache_key, base_prompt, ext_prompt))
+        return job
+
+    def _finished_job(self, scenario_number: int, video_info: dict | None = None,
+                      exception: Exception | None = None) -> VideoJob:
+        job = VideoJob(next(self._ids), scenario_number)
+        job.started_at = job.finished_at = job.submitted_at
+        if exception is not None:
+            job.status = "failed"
+            job.future.set_exception(exception)
+        else:
+            job.status = "done"
+            job.future.set_result(video_info)
+        return job
+
+    def _chain(self, job: VideoJob, shared: Future) -> None:
+        job.finished_at = time.monotonic()
+        exception = shared.exception()
+        if exception is not None:
+            job.status = "failed"
+            job.future.set_exception(exception)
+        else:
+            job.status = "done"
+            job.future.set_result(dict(shared.result()))
+
+    def _run(self, job: VideoJob, fn, args: tuple) -> None:
+        job.started_at = time.monotonic()
+        wait = job.started_at - job.submitted_at
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+        job.status = "running"
+
+        try:
+            video_info = fn(*args)
+        except Exception as e:
+            print(f"Video job {job.job_id} failed: {e}")
+            job.status = "failed"
+            job.finished_at = time.monotonic()
+            with self._lock:
+                self._running -= 1
+                self._failed += 1
+            job.future.set_exception(e)
+            return
+
+        job.status = "done"
+        job.finished_at = time.monotonic()
+        with self._lock:
+            self._running -= 1
+            self._completed += 1
+        job.future.set_result(dict(video_info))
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self._completed + self._failed + self._running
+            return {
+                "queue_depth": self._queued,
+                "running": self._running,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "cache_hits": self._cache_hits,
+                "coalesced": self._coalesced,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "avg_queue_wait_seconds": self._total_wait / started if started else 0.0,
+                "max_queue_wait_seconds": self._max_wait,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+video_jobs = VideoJobQueue()
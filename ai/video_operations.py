@@ -0,0 +1,136 @@
+from dotenv import load_dotenv
+from typing import NamedTuple
+
+import os
+import sqlite3
+import threading
+import time
+
+from ai.video_cache import VIDEO_CACHE_DIR
+
+
+load_dotenv()
+
+# Tomt värde räknas som ej satt, sqlite3.connect("") skulle ge en temporär databas
+VEO_OPERATIONS_DB = os.getenv("VEO_OPERATIONS_DB") or os.path.join(VIDEO_CACHE_DIR, "operations.sqlite3")
+# Veo sparar resultatet i två dygn, äldre operationer går inte att hämta
+VEO_OPERATION_MAX_AGE = float(os.getenv("VEO_OPERATION_MAX_AGE", str(2 * 24 * 3600)))
+
+STAGE_BASE = "base"
+STAGE_EXTENSION = "extension"
+
+
+class PendingOperation(NamedTuple):
+    cache_key: str
+    operation_name: str
+    prompt_hash: str
+    stage: str  # "base" eller "extension"
+    base_prompt: str
+    ext_prompt: str
+    created_at: float
+
+
+class VideoOperationStore:
+    """
+    SQLite record of Veo operations that have been started but whose video is
+    not yet in the cache, one row per cache key. The row follows the video
+    from the base to the extension stage and is removed once the video is
+    cached or has failed, so whatever is left after a restart can be
+    re-attached to the poller instead of paying for the generation again.
+    """
+
+    def __init__(self, path: str = VEO_OPERATIONS_DB, max_age: float = VEO_OPERATION_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS video_operations (
+                    cache_key TEXT PRIMARY KEY,
+                    operation_name TEXT NOT NULL,
+                    prompt_hash TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    base_prompt TEXT NOT NULL,
+                    ext_prompt TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn = conn
+        return self._conn
+
+    def record(self,
+               cache_key: str,
+               operation_name: str,
+               stage: str,
+               prompt_hash: str,
+               base_prompt: str,
+               ext_prompt: str) -> None:
+        """Saves (or moves to a new stage) the operation generating cache_key."""
+
+        now = time.time()
+        with self._lock:
+            self._connect().execute(
+                """
+                INSERT INTO video_operations
+                    (cache_key, operation_name, prompt_hash, stage, base_prompt, ext_prompt, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (cache_key) DO UPDATE SET
+                    operation_name = excluded.operation_name,
+                    stage = excluded.stage,
+                    updated_at = excluded.updated_at
+                """,
+                (cache_key, operation_name, prompt_hash, stage, base_prompt, ext_prompt, now, now)
+            )
+
+    def get(self, cache_key: str) -> PendingOperation | None:
+        with self._lock:
+            row = self._connect().execute(
+                """
+                SELECT cache_key, operation_name, prompt_hash, stage, base_prompt, ext_prompt, created_at
+                FROM video_operations WHERE cache_key = ? AND updated_at >= ?
+                """,
+                (cache_key, time.time() - self.max_age)
+            ).fetchone()
+        return PendingOperation(*row) if row else None
+
+    def discard(self, cache_key: str) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM video_operations WHERE cache_key = ?", (cache_key,))
+
+    def pending(self) -> list[PendingOperation]:
+        """Operations still worth resuming, oldest first. Expired ones are removed."""
+
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM video_operations WHERE updated_at < ?", (time.time() - self.max_age,))
+            rows = conn.execute(
+                """
+                SELECT cache_key, operation_name, prompt_hash, stage, base_prompt, ext_prompt, created_at
+                FROM video_operations ORDER BY created_at
+                """
+            ).fetchall()
+        return [PendingOperation(*row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT stage, COUNT(*) FROM video_operations GROUP BY stage"
+            ).fetchall()
+        return {"outstanding": dict(rows)}
+
+
+video_operations = VideoOperationStore()
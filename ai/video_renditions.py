@@ -0,0 +1,259 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from dotenv import load_dotenv
+
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+from ai.video_cache import VIDEO_CACHE_DIR
+
+
+load_dotenv()
+
+HLS_DIR = os.getenv("HLS_DIR", os.path.join(VIDEO_CACHE_DIR, "hls"))
+HLS_MEDIA_URL = "/media/hls"
+# Höjd:videobitrate per steg i stegen, lägst först
+HLS_LADDER = os.getenv("HLS_LADDER", "360:600k,540:1200k,720:2500k")
+HLS_SEGMENT_SECONDS = int(os.getenv("HLS_SEGMENT_SECONDS", "2"))
+HLS_AUDIO_BITRATE = os.getenv("HLS_AUDIO_BITRATE", "96k")
+# Antal ffmpeg-processer som får köras samtidigt
+HLS_WORKERS = int(os.getenv("HLS_WORKERS", "1"))
+FFMPEG = os.getenv("FFMPEG", "ffmpeg")
+# En video vars transkodning misslyckats försöks igen först efter så här lång tid, dubblat per misslyckande
+HLS_FAILURE_BACKOFF = float(os.getenv("HLS_FAILURE_BACKOFF", "600"))
+HLS_FAILURE_BACKOFF_MAX = 24 * 3600
+
+MASTER_PLAYLIST = "master.m3u8"
+POSTER = "poster.jpg"
+
+
+def parse_ladder(spec: str) -> list[tuple[int, str]]:
+    """"360:800k,720:3000k" -> [(360, "800k"), (720, "3000k")]."""
+
+    ladder = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        height, _, bitrate = part.partition(":")
+        ladder.append((int(height), bitrate or "1000k"))
+    return sorted(ladder)
+
+
+def ladder_id(ladder: list[tuple[int, str]],
+              segment_seconds: int = HLS_SEGMENT_SECONDS,
+              audio_bitrate: str = HLS_AUDIO_BITRATE) -> str:
+    """Short hash of everything that shapes the renditions, so a new ladder gets new paths and URLs."""
+
+    spec = ",".join(f"{height}:{bitrate}" for height, bitrate in ladder)
+    return hashlib.sha256(f"{spec}|{segment_seconds}|{audio_bitrate}".encode("utf-8")).hexdigest()[:12]
+
+
+def _bits_per_second(bitrate: str) -> int:
+    units = {"k": 1000, "m": 1000 * 1000}
+    suffix = bitrate[-1].lower()
+    if suffix in units:
+        return int(float(bitrate[:-1]) * units[suffix])
+    return int(bitrate)
+
+
+def _run_ffmpeg(args: list[str]) -> None:
+    result = subprocess.run(
+        [FFMPEG, "-hide_banner", "-loglevel", "error", "-y", *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.strip()[-500:]}")
+
+
+def transcode_hls(src_path: str,
+                  out_dir: str,
+                  ladder: list[tuple[int, str]],
+                  segment_seconds: int = HLS_SEGMENT_SECONDS,
+                  audio_bitrate: str = HLS_AUDIO_BITRATE) -> None:
+    """
+    Transcodes src_path into one HLS rendition per ladder step plus a poster
+    frame. Everything is written to a temporary directory that is renamed to
+    out_dir when complete, so a half-written ladder is never served.
+    """
+
+    tmp_dir = f"{out_dir}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    try:
+        master = ["#EXTM3U", "#EXT-X-VERSION:3"]
+        for i, (height, bitrate) in enumerate(ladder):
+            rendition_dir = os.path.join(tmp_dir, f"v{i}")
+            os.makedirs(rendition_dir)
+            _run_ffmpeg([
+                "-i", src_path,
+                "-map", "0:v:0", "-map", "0:a:0?",
+                "-vf", f"scale=-2:{height}",
+                "-c:v", "libx264", "-preset", "veryfast", "-profile:v", "main",
+                "-b:v", bitrate, "-maxrate", bitrate, "-bufsize", bitrate,
+                # Nyckelbildrutor på samma ställen i alla steg så att spelaren kan byta
+                "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})", "-sc_threshold", "0",
+                "-c:a", "aac", "-b:a", audio_bitrate, "-ac", "2",
+                "-f", "hls",
+                "-hls_time", str(segment_seconds),
+                "-hls_playlist_type", "vod",
+                "-hls_segment_filename", os.path.join(rendition_dir, "seg_%03d.ts"),
+                os.path.join(rendition_dir, "index.m3u8")
+            ])
+            bandwidth = _bits_per_second(bitrate) + _bits_per_second(audio_bitrate)
+            master.append(f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth}")
+            master.append(f"v{i}/index.m3u8")
+
+        _run_ffmpeg([
+            "-ss", "0.5", "-i", src_path,
+            "-frames:v", "1", "-vf", f"scale=-2:{ladder[-1][0]}", "-q:v", "3",
+            os.path.join(tmp_dir, POSTER)
+        ])
+
+        with open(os.path.join(tmp_dir, MASTER_PLAYLIST), "w", encoding="utf-8") as file:
+            file.write("\n".join(master) + "\n")
+
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.rename(tmp_dir, out_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+class VideoRenditions:
+    """
+    Post-processing stage that turns a finished mp4 into an HLS ladder and a
+    poster frame under HLS_DIR/<ladder id>/<key>/, where the ladder id is a
+    hash of the configured ladder, so reconfiguring it never serves (or lets
+    browsers keep) playlists from the old one. Each transcode runs as its own
+    ffmpeg process, at most `workers` at a time, and a key whose transcode
+    failed is retried only after an exponential backoff. ffmpeg is optional:
+    without it nothing is scheduled and players keep getting the progressive mp4.
+    """
+
+    def __init__(self,
+                 root: str = HLS_DIR,
+                 ladder: str = HLS_LADDER,
+                 workers: int = HLS_WORKERS):
+        self.root = root
+        self.ladder = parse_ladder(ladder)
+        self.ladder_id = ladder_id(self.ladder)
+        self.workers = workers
+        self.enabled = shutil.which(FFMPEG) is not None and bool(self.ladder)
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._in_flight: dict[str, Future] = {}
+        # key -> (tidpunkt för senaste misslyckandet, antal misslyckanden i rad)
+        self._failures: dict[str, tuple[float, int]] = {}
+        self._completed = 0
+        self._failed = 0
+        self._backed_off = 0
+
+    def _dir(self, key: str) -> str:
+        return os.path.join(self.root, self.ladder_id, key)
+
+    def available(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self._dir(key), MASTER_PLAYLIST))
+
+    def playlist_url(self, key: str) -> str | None:
+        """URL of the key's master playlist, or None if it has not been transcoded (yet)."""
+
+        if key and self.available(key):
+            return f"{HLS_MEDIA_URL}/{self.ladder_id}/{key}/{MASTER_PLAYLIST}"
+        return None
+
+    def poster_url(self, key: str) -> str | None:
+        if key and self.available(key):
+            return f"{HLS_MEDIA_URL}/{self.ladder_id}/{key}/{POSTER}"
+        return None
+
+    def file_path(self, key: str, name: str) -> str:
+        return os.path.join(self._dir(key), name)
+
+    def ensure(self, key: str, src_path: str) -> Future | None:
+        """
+        Schedules transcoding of src_path unless it is done, running, backing
+        off after a failure or ffmpeg is missing.
+        """
+
+        if not self.enabled or self.available(key):
+            return None
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            failure = self._failures.get(key)
+            if failure is not None:
+                failed_at, count = failure
+                if time.time() < failed_at + min(HLS_FAILURE_BACKOFF * 2 ** (count - 1), HLS_FAILURE_BACKOFF_MAX):
+                    self._backed_off += 1
+                    return None
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hls")
+                # Renditioner från en tidigare stege serveras aldrig igen
+                self._executor.submit(self._remove_stale_ladders)
+            future = self._executor.submit(
+                transcode_hls, src_path, self._dir(key), self.ladder
+            )
+            self._in_flight[key] = future
+
+        future.add_done_callback(lambda f: self._done(key, f))
+        return future
+
+    def _done(self, key: str, future: Future) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if future.cancelled():
+                self._failed += 1
+            elif future.exception():
+                self._failed += 1
+                _, count = self._failures.get(key, (0.0, 0))
+                self._failures[key] = (time.time(), count + 1)
+            else:
+                self._completed += 1
+                self._failures.pop(key, None)
+        if not future.cancelled() and future.exception():
+            print(f"Could not create HLS renditions for {key[:12]}: {future.exception()}")
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._failures.pop(key, None)
+        shutil.rmtree(self._dir(key), ignore_errors=True)
+
+    def _remove_stale_ladders(self) -> None:
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name != self.ladder_id:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "in_flight": len(self._in_flight),
+                "ladder_id": self.ladder_id,
+                "completed": self._completed,
+                "failed": self._failed,
+                "backing_off": len(self._failures),
+                "skipped_while_backing_off": self._backed_off,
+            }
+
+
+video_renditions = VideoRenditions()
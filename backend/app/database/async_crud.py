@@ -0,0 +1,291 @@
+from typing import Optional, List
+from . import models
+from sqlalchemy import select, insert, literal, func, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+import logging
+
+logger = logging.getLogger(__name__)
+
+"""
+Asynkron motsvarighet till crud.py för kod som kör på event-loopen (NiceGUI).
+Samma operationer och samma modeller, men på AsyncSession/asyncpg så att en
+handler kan awaita databasen utan att hoppa till en tråd.
+
+    async with AsyncSessionLocal() as db:
+        user = await async_crud.get_user(db, user_id)
+
+Objekten som returneras har redan alla kolumner laddade (expire_on_commit=False),
+men relationer laddas inte i efterhand: lazy loading fungerar inte med
+AsyncSession, så det som behövs hämtas i samma fråga.
+"""
+
+
+async def create_user(db: AsyncSession, username: str, age: int, gender: Optional[str] = None,
+                      occupation: Optional[str] = None, leadership_style: Optional[str] = None,
+                      priority: Optional[str] = None, team_role: Optional[str] = None,
+                      risk_tolerance: Optional[str] = None) -> models.User:
+    """
+    Skapar en ny användare i databasen.
+
+    Args:
+        db: Asynkron databassession
+        username: Användarnamn
+        age: Ålder
+        gender: Kön (optional)
+        occupation: Yrke/Studieinriktning (optional)
+        leadership_style: Ledarstil (optional)
+        priority: Prioritering i krissituation (optional)
+        team_role: Teamroll (optional)
+        risk_tolerance: Riskbenägenhet (optional)
+
+    Returns:
+        User-objekt
+
+    Raises:
+        SQLAlchemyError: Vid databasfel
+    """
+    try:
+        # RETURNING ger tillbaka raden utan en extra SELECT (db.refresh)
+        user = await db.scalar(
+            insert(models.User)
+            .values(
+                username=username,
+                age=age,
+                gender=gender,
+                occupation=occupation,
+                leadership_style=leadership_style,
+                priority=priority,
+                team_role=team_role,
+                risk_tolerance=risk_tolerance
+            )
+            .returning(models.User)
+        )
+        await db.commit()
+        logger.info(f"Created user: {user.user_id} - {username}")
+        return user
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error creating user: {e}")
+        raise
+
+
+async def save_user_choice_and_update_attributes(db: AsyncSession, user_id: int, level_id: int,
+                                                 scenario_id: int, choice_id: int) -> models.UserChoice:
+    """
+    Sparar en användares val och uppdaterar deras attribut-poäng i EN transaktion,
+    med samma två satser som crud.save_user_choice_and_update_attributes
+    (INSERT ... RETURNING och en mängdbaserad upsert från choice_attributes).
+
+    Args:
+        db: Asynkron databassession
+        user_id: Användarens ID
+        level_id: Nivå-ID
+        scenario_id: Scenario-ID
+        choice_id: Val-ID
+
+    Returns:
+        UserChoice-objekt
+
+    Raises:
+        SQLAlchemyError: Vid databasfel (rollback görs och inget av valet eller poängen sparas)
+    """
+    try:
+        user_choice = await db.scalar(
+            insert(models.UserChoice)
+            .values(
+                user_id=user_id,
+                level_id=level_id,
+                scenario_id=scenario_id,
+                choice_id=choice_id
+            )
+            .returning(models.UserChoice)
+        )
+
+        deltas = select(
+            literal(user_id, Integer),
+            models.choice_attributes.c.attribute_id,
+            models.choice_attributes.c.score_change
+        ).where(models.choice_attributes.c.choice_id == choice_id)
+
+        upsert = pg_insert(models.user_attributes).from_select(
+            ["user_id", "attribute_id", "score"], deltas
+        )
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[models.user_attributes.c.user_id, models.user_attributes.c.attribute_id],
+            set_={"score": func.coalesce(models.user_attributes.c.score, 0) + upsert.excluded.score}
+        )
+        updated = (await db.execute(upsert)).rowcount
+
+        await db.commit()
+        logger.info(f"Saved user choice and updated {updated} attributes for user {user_id}, choice {choice_id}")
+        return user_choice
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error saving user choice and updating attributes: {e}")
+        raise
+
+
+async def get_user(db: AsyncSession, user_id: int) -> Optional[models.User]:
+    """Hämtar en användare baserat på ID."""
+    try:
+        return await db.get(models.User, user_id)
+    except SQLAlchemyError as e:
+        logger.error(f"Error getting user {user_id}: {e}")
+        raise
+
+
+async def get_scenario(db: AsyncSession, scenario_id: int) -> Optional[models.Scenario]:
+    """Hämtar ett scenario baserat på ID."""
+    try:
+        return await db.get(models.Scenario, scenario_id)
+    except SQLAlchemyError as e:
+        logger.error(f"Error getting scenario {scenario_id}: {e}")
+        raise
+
+
+async def get_level(db: AsyncSession, level_id: int) -> Optional[models.Level]:
+    """Hämtar en level baserat på ID."""
+    try:
+        return await db.get(models.Level, level_id)
+    except SQLAlchemyError as e:
+        logger.error(f"Error getting level {level_id}: {e}")
+        raise
+
+
+async def get_choice_options(db: AsyncSession, scenario_id: int, is_good: Optional[bool] = None) -> List[models.ChoiceOption]:
+    """
+    Hämtar alla alternativ för ett specifikt scenario.
+
+    Args:
+        db: Asynkron databassession
+        scenario_id: Scenario-ID
+        is_good: Om None, hämtar alla val. Om True, hämtar bara bra val. Om False, hämtar bara dåliga val.
+
+    Returns:
+        Lista med ChoiceOption-objekt, sorterade efter choice_id för konsistens
+    """
+    try:
+        query = select(models.ChoiceOption).where(models.ChoiceOption.scenario_id == scenario_id)
+        if is_good is not None:
+            query = query.where(models.ChoiceOption.is_good == is_good)
+        return list(await db.scalars(query.order_by(models.ChoiceOption.choice_id)))
+    except SQLAlchemyError as e:
+        logger.error(f"Error getting choice options for scenario {scenario_id}: {e}")
+        raise
+
+
+async def get_scenarios_with_choices(db: AsyncSession, level_id: Optional[int] = None) -> List[tuple]:
+    """
+    Hämtar scenarier med level och val i två satser, oavsett antal scenarier
+    (samma form som Game_data_Service._load_catalog).
+
+    Args:
+        db: Asynkron databassession
+        level_id: Om satt, bara scenarier i denna level
+
+    Returns:
+        Lista med (level, scenario, [choice_options]) sorterad efter level_number och
+        scenario_id, valen sorterade efter choice_id
+    """
+    criteria = [models.Scenario.level_id == level_id] if level_id is not None else []
+    try:
+        rows = (await db.execute(
+            select(models.Level, models.Scenario)
+            .join(models.Scenario, models.Scenario.level_id == models.Level.level_id)
+            .where(*criteria)
+            .order_by(models.Level.level_number, models.Level.level_id, models.Scenario.scenario_id)
+        )).all()
+
+        choices_by_scenario = {}
+        if rows:
+            choices = await db.scalars(
+                select(models.ChoiceOption)
+                .join(models.Scenario, models.ChoiceOption.scenario_id == models.Scenario.scenario_id)
+                .where(*criteria)
+                .order_by(models.ChoiceOption.scenario_id, models.ChoiceOption.choice_id)
+            )
+            for choice in choices:
+                choices_by_scenario.setdefault(choice.scenario_id, []).append(choice)
+
+        return [(level, scenario, choices_by_scenario.get(scenario.scenario_id, [])) for level, scenario in rows]
+    except SQLAlchemyError as e:
+        logger.error(f"Error getting scenarios with choices: {e}")
+        raise
+
+
+async def get_user_attributes(db: AsyncSession, user_id: int) -> List[dict]:
+    """
+    Hämtar alla attribut och deras poäng för en specifik användare.
+
+    Args:
+        db: Asynkron databassession
+        user_id: Användarens ID
+
+    Returns:
+        Lista med dictionaries innehållande attributinformation och poäng
+    """
+    score = func.coalesce(models.user_attributes.c.score, 0).label('score')
+    try:
+        result = await db.execute(
+            select(
+                models.Attribute.attribute_id,
+                models.Attribute.name,
+                models.Attribute.description,
+                score
+            ).outerjoin(
+                models.user_attributes,
+                (models.user_attributes.c.attribute_id == models.Attribute.attribute_id) &
+                (models.user_attributes.c.user_id == user_id)
+            ).order_by(score.desc())
+        )
+        return [
+            {
+                "attribute_id": row.attribute_id,
+                "name": row.name,
+                "description": row.description,
+                "score": row.score
+            }
+            for row in result
+        ]
+    except SQLAlchemyError as e:
+        logger.error(f"Error getting user attributes for user {user_id}: {e}")
+        raise
+
+
+async def get_choice_attributes(db: AsyncSession, choice_id: int) -> List[dict]:
+    """
+    Hämtar alla attribut som påverkas av ett specifikt val.
+
+    Args:
+        db: Asynkron databassession
+        choice_id: Val-ID
+
+    Returns:
+        Lista med dictionaries innehållande attributinformation och poängförändring
+    """
+    try:
+        result = await db.execute(
+            select(
+                models.Attribute.attribute_id,
+                models.Attribute.name,
+                models.choice_attributes.c.score_change
+            ).join(
+                models.choice_attributes,
+                models.choice_attributes.c.attribute_id == models.Attribute.attribute_id
+            ).where(
+                models.choice_attributes.c.choice_id == choice_id
+            )
+        )
+        return [
+            {
+                "attribute_id": row.attribute_id,
+                "name": row.name,
+                "score_change": row.score_change
+            }
+            for row in result
+        ]
+    except SQLAlchemyError as e:
+        logger.error(f"Error getting choice attributes for choice {choice_id}: {e}")
+        raise
@@ -0,0 +1,176 @@
+"""
+Benchmark: spara ett val med attribut-uppdateringar
+====================================================
+Jämför den gamla vägen (ett commit för valet, en fråga för valets attribut och
+sedan update_user_attribute_score per attribut) med den nya
+save_user_choice_and_update_attributes (en transaktion, en mängdbaserad upsert).
+
+Rapporterar antal SQL-satser, commits och round trips per val samt p50/p99-latens.
+Round trips räknas som SQL-satser + commits.
+
+Skriptet skapar en egen användare och ett eget val som är kopplat till alla
+attribut i databasen och tar bort dem efteråt.
+
+    python backend/app/database/benchmark_choice_commit.py --iterations 200
+"""
+
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).resolve().parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import event, delete
+from sqlalchemy.orm import Session
+
+from backend.app.database.database import SessionLocal
+from backend.app.database.models import (
+    User, Level, Scenario, ChoiceOption, UserChoice, Attribute,
+    user_attributes, choice_attributes
+)
+from backend.app.database.crud import (
+    save_user_choice,
+    get_choice_attributes,
+    update_user_attribute_score,
+    save_user_choice_and_update_attributes,
+)
+
+
+class RoundTripCounter:
+    """Räknar SQL-satser och commits på en sessions connection."""
+
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+
+    def on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+
+    def on_commit(self, conn):
+        self.commits += 1
+
+    def attach(self, engine):
+        event.listen(engine, "before_cursor_execute", self.on_execute)
+        event.listen(engine, "commit", self.on_commit)
+
+    def detach(self, engine):
+        event.remove(engine, "before_cursor_execute", self.on_execute)
+        event.remove(engine, "commit", self.on_commit)
+
+    @property
+    def round_trips(self) -> int:
+        return self.statements + self.commits
+
+
+def legacy_save_user_choice_and_update_attributes(db: Session, user_id: int, level_id: int,
+                                                  scenario_id: int, choice_id: int):
+    """Den tidigare implementationen, behållen här som referens för jämförelsen."""
+    user_choice = save_user_choice(db, user_id, level_id, scenario_id, choice_id)
+    for attr in get_choice_attributes(db, choice_id):
+        update_user_attribute_score(db, user_id, attr["attribute_id"], attr["score_change"])
+    return user_choice
+
+
+def create_fixture(db: Session) -> dict:
+    """Skapar användare, level, scenario och ett val kopplat till alla attribut."""
+    attributes = db.query(Attribute).all()
+    if not attributes:
+        raise RuntimeError("No attributes in database - run init_db() or populate_from_mock.py first")
+
+    user = User(username="benchmark", age=25)
+    level = Level(level_number=0, title="benchmark")
+    db.add_all([user, level])
+    db.flush()
+
+    scenario = Scenario(level_id=level.level_id, scenario_text="benchmark scenario")
+    db.add(scenario)
+    db.flush()
+
+    choice = ChoiceOption(scenario_id=scenario.scenario_id, option_text="benchmark",
+                          outcome_text="benchmark", is_good=True)
+    db.add(choice)
+    db.flush()
+
+    db.execute(choice_attributes.insert(), [
+        {"choice_id": choice.choice_id, "attribute_id": a.attribute_id, "score_change": 1}
+        for a in attributes
+    ])
+    db.commit()
+
+    return {
+        "user_id": user.user_id,
+        "level_id": level.level_id,
+        "scenario_id": scenario.scenario_id,
+        "choice_id": choice.choice_id,
+        "attributes": len(attributes),
+    }
+
+
+def drop_fixture(db: Session, fixture: dict):
+    """Tar bort allt som create_fixture och benchmarken har skapat."""
+    db.execute(delete(UserChoice).where(UserChoice.user_id == fixture["user_id"]))
+    db.execute(delete(user_attributes).where(user_attributes.c.user_id == fixture["user_id"]))
+    db.execute(delete(choice_attributes).where(choice_attributes.c.choice_id == fixture["choice_id"]))
+    db.execute(delete(ChoiceOption).where(ChoiceOption.choice_id == fixture["choice_id"]))
+    db.execute(delete(Scenario).where(Scenario.scenario_id == fixture["scenario_id"]))
+    db.execute(delete(Level).where(Level.level_id == fixture["level_id"]))
+    db.execute(delete(User).where(User.user_id == fixture["user_id"]))
+    db.commit()
+
+
+def run(label: str, save_fn, fixture: dict, iterations: int) -> dict:
+    """Kör save_fn iterations gånger och mäter latens och round trips per val."""
+    db = SessionLocal()
+    engine = db.get_bind()
+    counter = RoundTripCounter()
+    latencies = []
+    try:
+        counter.attach(engine)
+        for _ in range(iterations):
+            start = time.perf_counter()
+            save_fn(db, fixture["user_id"], fixture["level_id"], fixture["scenario_id"], fixture["choice_id"])
+            latencies.append((time.perf_counter() - start) * 1000)
+        counter.detach(engine)
+    finally:
+        db.close()
+
+    percentiles = statistics.quantiles(latencies, n=100)
+    return {
+        "label": label,
+        "statements": counter.statements / iterations,
+        "commits": counter.commits / iterations,
+        "round_trips": counter.round_trips / iterations,
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": percentiles[98],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark för att spara val med attribut-uppdateringar")
+    parser.add_argument("--iterations", type=int, default=200, help="Antal val per variant")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    fixture = create_fixture(db)
+    try:
+        print(f"Benchmark: {args.iterations} val, {fixture['attributes']} attribut per val\n")
+        results = [
+            run("before (per-attribut)", legacy_save_user_choice_and_update_attributes, fixture, args.iterations),
+            run("after (en upsert)", save_user_choice_and_update_attributes, fixture, args.iterations),
+        ]
+    finally:
+        drop_fixture(db, fixture)
+        db.close()
+
+    print(f"{'variant':<24}{'satser':>8}{'commits':>9}{'round trips':>13}{'p50 ms':>9}{'p99 ms':>9}")
+    for r in results:
+        print(f"{r['label']:<24}{r['statements']:>8.1f}{r['commits']:>9.1f}{r['round_trips']:>13.1f}"
+              f"{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
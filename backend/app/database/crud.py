@@ -374,7 +374,11 @@ def link_choice_to_attribute(db: Session, choice_id: int, attribute_id: int, sco
 def save_user_choice_and_update_attributes(db: Session, user_id: int, level_id: int, scenario_id: int, choice_id: int) -> Optional[models.UserChoice]:
     """
     Sparar en användares val och uppdaterar deras attribut-poäng baserat på valet.
-    Denna funktion använder en transaktion för att säkerställa dataintegritet.
+    Allt sker i EN transaktion: valet läggs in med INSERT ... RETURNING och alla
+    poängförändringar från choice_attributes appliceras med en enda mängdbaserad
+    INSERT ... SELECT ... ON CONFLICT DO UPDATE. Ökningen görs i databasen
+    (score = user_attributes.score + excluded.score), så två samtidiga klick
+    kan inte skriva över varandras poäng.
     
     Args:
         db: Databassession
@@ -387,22 +391,44 @@ def save_user_choice_and_update_attributes(db: Session, user_id: int, level_id:
         UserChoice-objekt om framgångsrikt, None vid fel
     
     Raises:
-        SQLAlchemyError: Vid databasfel (rollback sker automatiskt)
+        SQLAlchemyError: Vid databasfel (rollback görs och inget av valet eller poängen sparas)
     """
+    from sqlalchemy import select, insert, literal, func, Integer
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+
     try:
-        # Spara valet
-        user_choice = save_user_choice(db, user_id, level_id, scenario_id, choice_id)
-        
-        # Hämta vilka attribut som påverkas av detta val
-        choice_attrs = get_choice_attributes(db, choice_id)
-        
-        # Uppdatera användarens attribut-poäng
-        for attr in choice_attrs:
-            update_user_attribute_score(db, user_id, attr["attribute_id"], attr["score_change"])
-        
-        logger.info(f"Saved user choice and updated attributes for user {user_id}, choice {choice_id}")
+        # Spara valet, RETURNING ger tillbaka raden utan en extra SELECT
+        user_choice = db.scalars(
+            insert(models.UserChoice)
+            .values(
+                user_id=user_id,
+                level_id=level_id,
+                scenario_id=scenario_id,
+                choice_id=choice_id
+            )
+            .returning(models.UserChoice)
+        ).one()
+
+        # Applicera alla attribut-förändringar för valet i en och samma sats
+        deltas = select(
+            literal(user_id, Integer),
+            models.choice_attributes.c.attribute_id,
+            models.choice_attributes.c.score_change
+        ).where(models.choice_attributes.c.choice_id == choice_id)
+
+        upsert = pg_insert(models.user_attributes).from_select(
+            ["user_id", "attribute_id", "score"], deltas
+        )
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[models.user_attributes.c.user_id, models.user_attributes.c.attribute_id],
+            set_={"score": func.coalesce(models.user_attributes.c.score, 0) + upsert.excluded.score}
+        )
+        updated = db.execute(upsert).rowcount
+
+        db.commit()
+        logger.info(f"Saved user choice and updated {updated} attributes for user {user_id}, choice {choice_id}")
         return user_choice
     except SQLAlchemyError as e:
-        # Transaktionen kommer att rollbackas automatiskt om något fel uppstår
+        db.rollback()
         logger.error(f"Error saving user choice and updating attributes: {e}")
         raise
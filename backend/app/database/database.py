@@ -1,9 +1,11 @@
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.exc import OperationalError
 from dotenv import load_dotenv
 
 import os
+import threading
 
 
 load_dotenv()
@@ -19,28 +21,210 @@ if not DATABASE_URL:
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is not configured. Please set it in .env file or environment variable.")
 
-try:
-    engine = create_engine(DATABASE_URL, echo=False)  # echo=True loggar alla sql frågor till konsolen
-    # Testa anslutningen
-    with engine.connect() as conn:
-        conn.execute(text("SELECT 1"))
-    print("Database connection successful!")
-except OperationalError as e:
-    print(f"Database connection failed: {e}")
-    raise
-except Exception as e:
-    print(f"Database connection error: {e}")
-    raise
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+"""
+Poolinställningar, kan sättas i .env
+DB_POOL_SIZE: antal connections som hålls öppna i poolen
+DB_MAX_OVERFLOW: antal extra connections utöver poolen vid toppar
+DB_POOL_PRE_PING: testar en connection innan den lämnas ut (tål omstartad databas)
+DB_POOL_RECYCLE: sekunder innan en connection byts ut (0 = aldrig)
+DB_STATEMENT_TIMEOUT_MS: maxtid för en SQL-sats i millisekunder (0 = ingen gräns)
+DB_LOCK_TIMEOUT_MS: maxtid att vänta på ett lås i millisekunder (0 = ingen gräns)
+"""
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+DB_LOCK_TIMEOUT_MS = int(os.getenv("DB_LOCK_TIMEOUT_MS", "0"))
+
+
+def _connect_args() -> dict:
+    """Timeouts skickas som serverinställningar när en connection öppnas (endast PostgreSQL)."""
+    if not DATABASE_URL.startswith("postgresql"):
+        return {}
+    options = []
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        options.append(f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}")
+    if DB_LOCK_TIMEOUT_MS > 0:
+        options.append(f"-c lock_timeout={DB_LOCK_TIMEOUT_MS}")
+    return {"options": " ".join(options)} if options else {}
+
 
 """
 skapar session-fabrik för databassessioner
 autocommit=False: ändringar kräver explicit commit
 autoflush=False: Flush-operationer måste anropas explicit
+Fabriken binds till motorn först när den första sessionen skapas.
 """
-if engine:
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-else:
-    SessionLocal = None
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Returnerar den delade motorn och skapar den vid första anropet.
+    Att skapa motorn öppnar ingen connection, det sker först när en fråga körs.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(
+                    DATABASE_URL,
+                    echo=False,  # echo=True loggar alla sql frågor till konsolen
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=DB_MAX_OVERFLOW,
+                    pool_pre_ping=DB_POOL_PRE_PING,
+                    pool_recycle=DB_POOL_RECYCLE if DB_POOL_RECYCLE > 0 else -1,
+                    connect_args=_connect_args(),
+                )
+                _session_factory.configure(bind=_engine)
+    return _engine
+
+
+def SessionLocal(**kwargs):
+    """Skapar en ny databassession mot den delade motorn."""
+    get_engine()
+    return _session_factory(**kwargs)
+
+
+def check_connection() -> None:
+    """
+    Explicit hälsokontroll av databasen (SELECT 1).
+    Anropas vid uppstart istället för vid import.
+
+    Raises:
+        OperationalError: Om databasen inte går att nå
+    """
+    try:
+        with get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+        print("Database connection successful!")
+    except OperationalError as e:
+        print(f"Database connection failed: {e}")
+        raise
+    except Exception as e:
+        print(f"Database connection error: {e}")
+        raise
+
+
+def dispose_engine(close: bool = True) -> None:
+    """
+    Släpper motorn och dess pool, nästa anrop till get_engine() skapar en ny.
+    Används vid nedstängning. I en ny process efter fork anropas den med
+    close=False så att förälderns connections inte stängs.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose(close=close)
+            _engine = None
+
+
+def _dispose_engine_after_fork() -> None:
+    # Låset kan ha varit taget av en annan tråd i föräldern vid fork, barnet får ett nytt
+    global _engine_lock
+    _engine_lock = threading.Lock()
+    dispose_engine(close=False)
+
+
+# Barnprocesser (multiprocessing, uvicorn-workers) får en egen pool och rör aldrig förälderns connections
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_engine_after_fork)
+
+
+"""
+Asynkron motor (asyncpg) för kod som kör på event-loopen, se async_crud.py.
+Samma databas och timeouts som den synkrona motorn, men en egen, mindre pool.
+Den skapas först när den används, så asyncpg behövs bara då.
+DB_ASYNC_POOL_SIZE / DB_ASYNC_MAX_OVERFLOW: den asynkrona poolens storlek.
+En process kan alltså öppna högst DB_POOL_SIZE + DB_MAX_OVERFLOW +
+DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW connections, räkna med alla fyra
+mot databasens max_connections.
+"""
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "2"))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "3"))
+
+_async_session_factory = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+_async_engine = None
+
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    """postgresql://... eller postgresql+psycopg2://... -> postgresql+asyncpg://..."""
+    scheme, sep, rest = url.partition("://")
+    if scheme.split("+")[0] in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    return url
+
+
+def _async_connect_args() -> dict:
+    """Samma timeouts som _connect_args, men som asyncpg:s server_settings."""
+    if not DATABASE_URL.startswith("postgresql"):
+        return {}
+    settings = {}
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        settings["statement_timeout"] = str(DB_STATEMENT_TIMEOUT_MS)
+    if DB_LOCK_TIMEOUT_MS > 0:
+        settings["lock_timeout"] = str(DB_LOCK_TIMEOUT_MS)
+    return {"server_settings": settings} if settings else {}
+
+
+def get_async_engine():
+    """
+    Returnerar den delade asynkrona motorn och skapar den vid första anropet.
+    asyncpg-connections hör till den event-loop som öppnade dem, så motorn ska
+    användas från appens loop (NiceGUI) och inte från andra trådar.
+    """
+    global _async_engine
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                _async_engine = create_async_engine(
+                    async_database_url(),
+                    echo=False,
+                    pool_size=DB_ASYNC_POOL_SIZE,
+                    max_overflow=DB_ASYNC_MAX_OVERFLOW,
+                    pool_pre_ping=DB_POOL_PRE_PING,
+                    pool_recycle=DB_POOL_RECYCLE if DB_POOL_RECYCLE > 0 else -1,
+                    connect_args=_async_connect_args(),
+                )
+                _async_session_factory.configure(bind=_async_engine)
+    return _async_engine
+
+
+def AsyncSessionLocal(**kwargs) -> AsyncSession:
+    """Skapar en ny asynkron databassession, används som `async with AsyncSessionLocal() as db:`."""
+    get_async_engine()
+    return _async_session_factory(**kwargs)
+
+
+async def dispose_async_engine() -> None:
+    """Stänger den asynkrona motorns pool, nästa get_async_engine() skapar en ny."""
+    global _async_engine
+    with _engine_lock:
+        engine = _async_engine
+        _async_engine = None
+    if engine is not None:
+        await engine.dispose()
+
+
+def __getattr__(name):
+    # `from database import engine` fungerar fortfarande men skapar motorn först då
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 """basklass för deklarativa modeller
    alla databasmodeller bör ärva från denna Base"""
@@ -88,7 +272,7 @@ def init_db():
     print(f"Creating {len(registered_tables)} tables: {', '.join(registered_tables)}")
     
     try:
-        Base.metadata.create_all(bind=engine)
+        Base.metadata.create_all(bind=get_engine())
         print(f"Successfully created all tables!")
     except Exception as e:
         print(f"Error creating tables: {e}")
@@ -96,7 +280,7 @@ def init_db():
     
     # Migrera users-tabellen - lägg till nya kolumner om de saknas
     try:
-        with engine.connect() as conn:
+        with get_engine().connect() as conn:
             # Kolla vilka kolumner som finns
             result = conn.execute(text("""
                 SELECT column_name 
@@ -135,6 +319,25 @@ def init_db():
     except Exception as e:
         print(f"Migration note: {e}")
         # Fortsätt ändå - tabellerna kanske redan är korrekta
+
+    # Migrera scenarios-tabellen - content_hash med index, fyll i saknade värden
+    try:
+        from backend.app.database.models import scenario_content_hash
+        with get_engine().connect() as conn:
+            conn.execute(text("ALTER TABLE scenarios ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_scenarios_content_hash ON scenarios(content_hash)"))
+            rows = conn.execute(text(
+                "SELECT scenario_id, scenario_text FROM scenarios WHERE content_hash IS NULL"
+            )).fetchall()
+            if rows:
+                print(f"Migrating scenarios table - computing content_hash for {len(rows)} scenarios")
+                conn.execute(
+                    text("UPDATE scenarios SET content_hash = :content_hash WHERE scenario_id = :scenario_id"),
+                    [{"scenario_id": row[0], "content_hash": scenario_content_hash(row[1])} for row in rows]
+                )
+            conn.commit()
+    except Exception as e:
+        print(f"Migration note: {e}")
     
     # Kontrollera om databasen är tom och populera från mock.json om så är fallet
     try:
@@ -1,6 +1,7 @@
 from typing import List, Optional, TYPE_CHECKING
+import hashlib
 from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, func, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from .database import Base
 
 if TYPE_CHECKING:
@@ -65,6 +66,16 @@ class Level(Base):
     user_choices: "List[UserChoice]" = relationship("UserChoice", back_populates="level")
 
 
+def scenario_content_hash(scenario_text: str) -> str:
+    """sha256 av scenariotexten utan omgivande blanktecken, matchar mock.json mot databasen"""
+    return hashlib.sha256(scenario_text.strip().encode("utf-8")).hexdigest()
+
+
+def _default_content_hash(context) -> Optional[str]:
+    scenario_text = context.get_current_parameters().get("scenario_text")
+    return scenario_content_hash(scenario_text) if scenario_text is not None else None
+
+
 """Tabell Scenarios"""
 class Scenario(Base):
     __tablename__ = "scenarios"
@@ -73,11 +84,19 @@ class Scenario(Base):
     scenario_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     level_id = Column(Integer, ForeignKey("levels.level_id"), nullable=False)
     scenario_text = Column(Text, nullable=False)
+    # Sätts automatiskt vid insert, index istället för likhetsjämförelse på TEXT-kolumnen
+    content_hash = Column(String(64), nullable=True, index=True, default=_default_content_hash)
 
     level: "Level" = relationship("Level", back_populates="scenarios")
     choice_options: "List[ChoiceOption]" = relationship("ChoiceOption", back_populates="scenario")
     user_choices: "List[UserChoice]" = relationship("UserChoice", back_populates="scenario")
 
+    @validates("scenario_text")
+    def _update_content_hash(self, key, scenario_text):
+        # Hashen följer texten när den ändras, annars matchar scenariot aldrig mock.json igen
+        self.content_hash = scenario_content_hash(scenario_text) if scenario_text is not None else None
+        return scenario_text
+
 
 """Tabell Choice Options"""
 class ChoiceOption(Base):
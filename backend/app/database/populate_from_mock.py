@@ -18,7 +18,7 @@ from sqlalchemy.exc import OperationalError
 
 from backend.app.database.database import SessionLocal, init_db
 from backend.app.database.models import (
-    Level, Scenario, ChoiceOption, Attribute
+    Level, Scenario, ChoiceOption, Attribute, scenario_content_hash
 )
 from backend.app.database.crud import link_choice_to_attribute
 
@@ -82,7 +82,8 @@ def create_levels_and_scenarios(db: Session, scenarios_data):
     for idx, scenario_data in enumerate(scenarios_data, 1):
         scenario = Scenario(
             level_id=level.level_id,
-            scenario_text=scenario_data["text"]
+            scenario_text=scenario_data["text"],
+            content_hash=scenario_content_hash(scenario_data["text"])
         )
         db.add(scenario)
         db.flush()
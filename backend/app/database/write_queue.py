@@ -0,0 +1,140 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+from dotenv import load_dotenv
+
+import os
+import statistics
+import threading
+import time
+
+from .database import DB_POOL_SIZE
+
+
+load_dotenv()
+
+"""
+Skrivkö för databasen, kan sättas i .env
+DB_WRITE_WORKERS: antal trådar som skriver samtidigt (standard = poolens storlek, så ingen väntar på en connection)
+DB_WRITE_MAX_QUEUE: max antal skrivningar som får vänta, fler avvisas direkt istället för att köa i minnet
+"""
+DB_WRITE_WORKERS = int(os.getenv("DB_WRITE_WORKERS", str(DB_POOL_SIZE)))
+DB_WRITE_MAX_QUEUE = int(os.getenv("DB_WRITE_MAX_QUEUE", "500"))
+
+# Antal senaste väntetider som p95 räknas på
+WAIT_SAMPLES = 1000
+
+
+class DbWriteQueue:
+    """
+    Runs blocking database writes (sessions, commits) on a bounded thread pool
+    so UI event handlers never wait on Postgres. submit() returns a Future
+    immediately, or None when max_queue writes are already waiting; the caller
+    decides what a rejected write means for the player (backpressure instead
+    of an ever-growing backlog). Queue wait and run times are tracked per
+    write so a slow database shows up in the metrics before it shows up in
+    the UI.
+    """
+
+    def __init__(self,
+                 max_workers: int = DB_WRITE_WORKERS,
+                 max_queue: int = DB_WRITE_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="db-write")
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._queued = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._total_run = 0.0
+        self._by_name: dict[str, int] = {}
+
+    def submit(self, name: str, fn, *args, **kwargs) -> Future | None:
+        """Queues fn(*args, **kwargs). Returns its Future, or None if the queue is full or shut down."""
+
+        with self._lock:
+            if self._shutdown:
+                self._rejected += 1
+                print(f"Database write queue is shut down - rejecting {name}")
+                return None
+            if self._queued >= self.max_queue:
+                self._rejected += 1
+                print(f"Database write queue is full ({self._queued} waiting) - rejecting {name}")
+                return None
+            self._queued += 1
+            self._submitted += 1
+            self._by_name[name] = self._by_name.get(name, 0) + 1
+
+        try:
+            return self._executor.submit(self._run, time.monotonic(), fn, args, kwargs)
+        except RuntimeError:
+            # Stängdes mellan kontrollen och submit
+            with self._lock:
+                self._queued -= 1
+                self._submitted -= 1
+                self._by_name[name] -= 1
+                self._rejected += 1
+            return None
+
+    def _run(self, submitted_at: float, fn, args: tuple, kwargs: dict):
+        started_at = time.monotonic()
+        wait = started_at - submitted_at
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+            self._waits.append(wait)
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self._running -= 1
+                self._failed += 1
+                self._total_run += time.monotonic() - started_at
+            raise
+
+        with self._lock:
+            self._running -= 1
+            self._completed += 1
+            self._total_run += time.monotonic() - started_at
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self._completed + self._failed + self._running
+            finished = self._completed + self._failed
+            waits = list(self._waits)
+            return {
+                "queue_depth": self._queued,
+                "running": self._running,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "by_name": dict(self._by_name),
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "avg_queue_wait_seconds": self._total_wait / started if started else 0.0,
+                "p95_queue_wait_seconds": statistics.quantiles(waits, n=20)[18] if len(waits) >= 2 else sum(waits, 0.0),
+                "max_queue_wait_seconds": self._max_wait,
+                "avg_run_seconds": self._total_run / finished if finished else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        """Lets queued writes finish (they are player data), then stops the workers."""
+
+        with self._lock:
+            self._shutdown = True
+        self._executor.shutdown(wait=True)
+
+
+db_writes = DbWriteQueue()
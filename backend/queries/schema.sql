@@ -28,12 +28,14 @@ CREATE INDEX IF NOT EXISTS ix_levels_level_id ON levels(level_id);
 CREATE TABLE scenarios (
     scenario_id    SERIAL PRIMARY KEY,
     level_id       INT NOT NULL REFERENCES levels(level_id) ON DELETE CASCADE,
-    scenario_text  TEXT NOT NULL
+    scenario_text  TEXT NOT NULL,
+    content_hash   VARCHAR(64)         -- sha256 av scenario_text (strip), matchar mock.json mot databasen
 );
 
 -- Create indexes for scenarios table
 CREATE INDEX IF NOT EXISTS ix_scenarios_scenario_id ON scenarios(scenario_id);
 CREATE INDEX IF NOT EXISTS ix_scenarios_level_id ON scenarios(level_id);
+CREATE INDEX IF NOT EXISTS ix_scenarios_content_hash ON scenarios(content_hash);
 
 CREATE TABLE choice_options (
     choice_id      SERIAL PRIMARY KEY,
@@ -6,6 +6,7 @@ Fixed header with logo and user menu
 
 from nicegui import ui
 from config.theme import COLORS, SIZES
+from image_variants import picture
 
 def create_header():
     """Creates a fixed header at the top"""
@@ -23,7 +24,7 @@ def create_header():
         
         # Logo/Brand (left side)
         with ui.row().classes('items-center gap-2'):
-            ui.image('/assets/logo_icon.png').style('width: 60px; height: 60px') 
+            picture('/assets/logo_icon.png', sizes='60px', alt='Crisis Mind').style('width: 60px; height: 60px') 
             
             ui.label('CRISIS MIND').style(
                 f'color: {COLORS["text_white"]}; '
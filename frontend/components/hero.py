@@ -1,5 +1,6 @@
 from nicegui import ui
 from config.theme import COLORS, SIZES, EFFECTS
+from image_variants import picture, background_image
 
 '''
 HERO Section Component
@@ -10,11 +11,12 @@ First section the user sees
 def create_hero_section():
     # Creates hero-section with title and buttons
     
-    background_image = 'url(/assets/hero_background.jpg)'
+    # AVIF/WebP-variant om den finns, annars originalet
+    hero_background = background_image('/assets/hero_background.jpg')
     
     with ui.column().classes('w-full items-center justify-center').style(
         f'min-height: 100vh; '
-        f'background-image: {background_image}; '
+        f'{hero_background}; '
         f'background-size: cover; '   
         f'background-position: center; ' 
         f'background-repeat: no-repeat; '
@@ -34,7 +36,7 @@ def create_hero_section():
         with ui.column().classes('items-center').style('position: relative; z-index: 1'):
             
             # Our icon for the game
-            ui.image('/assets/hackathon_msb.jpeg').style(
+            picture('/assets/hackathon_msb.jpeg', sizes='350px', alt='Crisis Mind').style(
                 'width: 350px; '
                 'height: 350px; '
                 'margin-bottom: 2rem; '
@@ -102,8 +104,9 @@ def create_hero_section():
 def start_game():
     """Opens registration modal"""
     # Import here to avoid circular imports
-    from components.registration_modal import registration_modal
-    registration_modal.show()
+    from components.registration_modal import RegistrationModal
+    # En modal per klick: formulärets fält och dialogen får inte delas mellan webbläsare
+    RegistrationModal().show()
 
 
 def learn_more():
@@ -4,10 +4,14 @@ Registration Modal Component
 Popup for user registration before starting the game
 """
 
+import asyncio
+
 from nicegui import ui
 from config.theme import COLORS, SIZES, EFFECTS
 from backend.app.database.models import User
 from backend.app.database.database import SessionLocal
+from backend.app.database.write_queue import db_writes
+from game.player_storage import remember_player
 
 class RegistrationModal:
     def __init__(self):
@@ -211,7 +215,7 @@ class RegistrationModal:
             )
             
             # Submit button
-            ui.button('STARTA SPELET', on_click=self._submit).props('flat').style(
+            self.submit_button = ui.button('STARTA SPELET', on_click=self._submit).props('flat').style(
                 f'background: {COLORS["button_blue"]} !important; '
                 f'color: white !important; '
                 f'font-weight: bold; '
@@ -250,51 +254,77 @@ class RegistrationModal:
         self.dialog.close()
         ui.notify('Registrering avbruten', type='warning')
     
-    def _submit(self):
-        """Validates and saves user data, then redirects to game"""
+    async def _submit(self):
+        """Validates the form, saves the user in the background and redirects to the game"""
         
         # Basic validation
         if not self.username.value:
             ui.notify("Vänligen fyll i användarnamn", type="negative")
             return
         
+        # Läs formuläret innan något väntas på, sparningen sker i databasens skrivkö
+        user_data = {
+            'username': self.username.value,
+            'age': self.age.value,
+            'gender': self.gender.value,
+            'occupation': self.occupation.value,
+            'leadership_style': self.leadership_style.value,
+            'priority': self.priority.value,
+            'team_role': self.team_role.value,
+            'risk_tolerance': self.risk_tolerance.value,
+        }
+        future = db_writes.submit('create_user', save_user, user_data)
+        if future is None:
+            # Skrivkön är full: behåll formuläret så att spelaren kan försöka igen
+            ui.notify('Hög belastning just nu, försök igen om en stund', type='warning')
+            return
+
+        # Event-loopen är fri medan skrivkön sparar användaren, knappen spärras så att ingen dubblett skapas
+        self.submit_button.disable()
+        user_id = None
         try:
-            db = SessionLocal()
-            try:
-                new_user = User(
-                    username=self.username.value,
-                    age=int(self.age.value),
-                    gender=self.gender.value,
-                    occupation=self.occupation.value,
-                    leadership_style=self.leadership_style.value,
-                    priority=self.priority.value,
-                    team_role=self.team_role.value,
-                    risk_tolerance=self.risk_tolerance.value
-                )
-                db.add(new_user)
-                db.commit()
-                db.refresh(new_user)
-                
-                print(f" User saved with ID: {new_user.user_id}")
-                print(f" User data: username={new_user.username}, age={new_user.age}, gender={new_user.gender}")
-                    
-            
-            except Exception as e:
-                    db.rollback()
-                    print(f"Database save error: {e}")
-            finally:
-                db.close()
+            user_id = await asyncio.wrap_future(future)
         except Exception as e:
             print(f"Database connection error: {e}")
-            print("Continuing without database...")  
-            
-        # Close modal
+
         self.dialog.close()
-        ui.notify('Registrering klar! Startar spelet...', type='positive') 
-                    
-        # Navigate to game page
+        if user_id:
+            ui.notify('Registrering klar! Startar spelet...', type='positive')
+            # Spelaren knyts till webbläsaren på servern, user_id styr vilken video spelaren får
+            remember_player(user_id)
+        else:
+            # Som tidigare: spelet fungerar utan databas, valen sparas bara inte
+            print("Continuing without database...")
+            ui.notify('Registreringen kunde inte sparas, spelet startar utan att dina val sparas', type='warning')
         ui.navigate.to('/game')
 
-# Create global instance
-registration_modal = RegistrationModal()
+
+def save_user(user_data: dict):
+    """Saves a registered user and returns its user_id, or None on error. Runs in db_writes' write queue."""
+    db = SessionLocal()
+    try:
+        new_user = User(
+            username=user_data['username'],
+            age=int(user_data['age']),
+            gender=user_data['gender'],
+            occupation=user_data['occupation'],
+            leadership_style=user_data['leadership_style'],
+            priority=user_data['priority'],
+            team_role=user_data['team_role'],
+            risk_tolerance=user_data['risk_tolerance']
+        )
+        db.add(new_user)
+        db.commit()
+        db.refresh(new_user)
+        
+        print(f" User saved with ID: {new_user.user_id}")
+        print(f" User data: username={new_user.username}, age={new_user.age}, gender={new_user.gender}")
+        return new_user.user_id
+    except Exception as e:
+        db.rollback()
+        print(f"Database save error: {e}")
+        return None
+    finally:
+        db.close()
+
 
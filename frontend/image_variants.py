@@ -0,0 +1,229 @@
+"""
+Image Variants
+==============================
+Resized WebP/AVIF copies of the landing page assets and the feedback images
+in mock_data, with content-hashed file names so they can be cached forever.
+Built at startup (in the background) or ahead of time with:
+
+    python frontend/image_variants.py
+
+Components use picture()/srcset()/background_image() and fall back to the
+original file until its variants exist. Pillow is optional; without it only
+the originals are served.
+"""
+
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow är valfritt
+    Image = None
+
+frontend_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(frontend_dir)
+
+# URL-prefix -> katalog för bilderna som ska få varianter
+IMAGE_SOURCES = {
+    '/assets': os.path.join(frontend_dir, 'assets'),
+    '/mock_data': os.path.join(project_root, 'mock_data'),
+}
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+IMAGE_VARIANTS_DIR = os.getenv('IMAGE_VARIANTS_DIR', os.path.join(project_root, 'image_variants'))
+IMAGE_VARIANTS_URL = '/images'
+IMAGE_VARIANT_WIDTHS = [int(w) for w in os.getenv('IMAGE_VARIANT_WIDTHS', '320,640,960,1280,1920').split(',') if w.strip()]
+
+# Format -> (MIME-typ, Pillow-format, sparinställningar), bäst komprimerat först
+FORMATS = {
+    'avif': ('image/avif', 'AVIF', {'quality': 55}),
+    'webp': ('image/webp', 'WEBP', {'quality': 78, 'method': 6}),
+}
+MANIFEST = 'manifest.json'
+
+_lock = threading.Lock()
+_manifest = None
+
+
+def _formats() -> list:
+    if Image is None:
+        return []
+    return [fmt for fmt in FORMATS if features.check(fmt)]
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _variant_hash(source_digest: str, width: int, fmt: str) -> str:
+    """Hash over the source content and everything that decides the variant's bytes."""
+    payload = json.dumps([source_digest, width, fmt, FORMATS[fmt][2]])
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _load_manifest() -> dict:
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(os.path.join(IMAGE_VARIANTS_DIR, MANIFEST), 'r', encoding='utf-8') as f:
+                _manifest = json.load(f)
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest
+
+
+def _save_manifest(manifest: dict) -> None:
+    path = os.path.join(IMAGE_VARIANTS_DIR, MANIFEST)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _build_one(path: str, formats: list) -> dict:
+    """Writes all variants of one image. Returns its manifest entry."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    source_digest = _file_digest(path)
+    with Image.open(path) as image:
+        image.load()
+        width, height = image.size
+        has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        # Aldrig större än originalet, men originalbredden finns alltid med
+        widths = sorted({w for w in IMAGE_VARIANT_WIDTHS if w < width} | {width})
+        variants = {}
+        for fmt in formats:
+            _, pil_format, options = FORMATS[fmt]
+            variants[fmt] = []
+            for w in widths:
+                name = f'{stem}-{w}.{_variant_hash(source_digest, w, fmt)}.{fmt}'
+                out_path = os.path.join(IMAGE_VARIANTS_DIR, name)
+                if not os.path.exists(out_path):
+                    resized = image if w == width else image.resize((w, round(height * w / width)), Image.LANCZOS)
+                    tmp_path = f'{out_path}.{threading.get_ident()}.tmp'
+                    resized.save(tmp_path, pil_format, **options)
+                    os.replace(tmp_path, out_path)
+                variants[fmt].append([w, f'{IMAGE_VARIANTS_URL}/{name}'])
+
+    return {'width': width, 'height': height, 'variants': variants}
+
+
+def build_image_variants() -> dict:
+    """Generates missing variants for every source image and updates the manifest."""
+    global _manifest
+    formats = _formats()
+    if not formats:
+        print('Pillow (with WebP/AVIF) is not installed - serving original images')
+        return {}
+
+    os.makedirs(IMAGE_VARIANTS_DIR, exist_ok=True)
+    manifest = {}
+    for url_prefix, directory in IMAGE_SOURCES.items():
+        for name in sorted(os.listdir(directory)):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            try:
+                manifest[f'{url_prefix}/{name}'] = _build_one(os.path.join(directory, name), formats)
+            except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as e:
+                # Trasiga bilder (UnidentifiedImageError är ett OSError, vissa plugins ger SyntaxError) hoppas över
+                print(f'Could not create variants for {name}: {e!r}')
+
+    # Ta bort varianter som inte längre hör till någon bild
+    current = {url.rsplit('/', 1)[1] for entry in manifest.values()
+               for variants in entry['variants'].values() for _, url in variants}
+    for name in os.listdir(IMAGE_VARIANTS_DIR):
+        if name != MANIFEST and name not in current and not name.endswith('.tmp'):
+            os.remove(os.path.join(IMAGE_VARIANTS_DIR, name))
+
+    with _lock:
+        _save_manifest(manifest)
+        _manifest = manifest
+    return manifest
+
+
+def start_building_image_variants() -> None:
+    """Builds the variants in a background thread so startup isn't delayed."""
+    if Image is not None:
+        threading.Thread(target=build_image_variants, name='image-variants', daemon=True).start()
+
+
+def variant_path(name: str) -> str:
+    return os.path.join(IMAGE_VARIANTS_DIR, name)
+
+
+def srcset(src: str, fmt: str = 'webp') -> str:
+    """'url 320w, url 640w, ...' for the image, or '' if it has no variants in that format."""
+    with _lock:
+        entry = _load_manifest().get(src)
+    if not entry:
+        return ''
+    return ', '.join(f'{url} {w}w' for w, url in entry['variants'].get(fmt, []))
+
+
+def picture(src: str, sizes: str = '100vw', alt: str = ''):
+    """
+    A <picture> with AVIF and WebP sources and the original as fallback.
+    Returns the inner <img> so callers can style it like ui.image.
+    """
+    from nicegui import ui
+    from game.static_files import static_files
+
+    with ui.element('picture'):
+        for fmt, (mime, _, _) in FORMATS.items():
+            candidates = srcset(src, fmt)
+            if candidates:
+                source = ui.element('source')
+                source.props['type'] = mime
+                source.props['srcset'] = candidates
+                source.props['sizes'] = sizes
+        img = ui.element('img')
+        img.props['src'] = static_files.url(src)
+        img.props['alt'] = alt
+        img.props['decoding'] = 'async'
+    return img
+
+
+def background_image(src: str, width: int = 1920) -> str:
+    """
+    CSS declarations for a background image: `background` with the original,
+    then `background-image` with an image-set() of the smallest variant at
+    least `width` wide in each format (original last). Browsers that don't
+    understand image-set()/type() drop the second declaration and keep the
+    first. Two different properties, since NiceGUI's style() keeps only the
+    last value of a repeated one; set background-size etc. after these.
+    """
+    from game.static_files import static_files
+
+    fallback = static_files.url(src)
+    with _lock:
+        entry = _load_manifest().get(src)
+    if not entry:
+        return f'background: url({fallback})'
+
+    candidates = []
+    for fmt, (mime, _, _) in FORMATS.items():
+        variants = entry['variants'].get(fmt)
+        if variants:
+            url = next((url for w, url in variants if w >= width), variants[-1][1])
+            candidates.append(f'url({url}) type("{mime}")')
+    candidates.append(f'url({fallback}) type("{mimetypes.guess_type(src)[0]}")')
+    return f'background: url({fallback}); background-image: image-set({", ".join(candidates)})'
+
+
+if __name__ == '__main__':
+    for src, entry in build_image_variants().items():
+        directory = IMAGE_SOURCES[src.rsplit('/', 1)[0]]
+        original = os.path.getsize(os.path.join(directory, src.rsplit('/', 1)[1]))
+        # Storlek för den största varianten (originalbredden) i varje format
+        largest = {fmt: os.path.getsize(variant_path(variants[-1][1].rsplit('/', 1)[1]))
+                   for fmt, variants in entry['variants'].items()}
+        print(f'{src}: {entry["width"]}x{entry["height"]}, {original // 1024} KiB -> '
+              + ', '.join(f'{fmt} {size // 1024} KiB' for fmt, size in largest.items()))
@@ -6,6 +6,7 @@ MAIN FILE - imports and combines all components
 
 import sys
 import os
+import re
 
 # Sätt upp rätt sökvägar
 frontend_dir = os.path.dirname(os.path.abspath(__file__))
@@ -13,6 +14,7 @@ project_root = os.path.dirname(frontend_dir)
 sys.path.insert(0, project_root)
 
 from nicegui import ui, app
+from fastapi import HTTPException, Request
 from components.header import create_header
 from components.hero import create_hero_section
 from components.features import create_features_section
@@ -22,19 +24,48 @@ import os
 # Importera alla modeller FÖRST så att de registreras i Base.metadata
 from backend.app.database import models  # noqa: F401 - importerar alla modeller
 from backend.app.database.models import User, Level, Scenario, ChoiceOption, UserChoice, Attribute
-from backend.app.database.database import Base, engine, init_db
+from backend.app.database.database import Base, init_db, check_connection, dispose_engine, dispose_async_engine
+from backend.app.database.write_queue import db_writes
 from mock_data import mock_game
+from ai.genai_client import genai_clients
+from game.media import file_response
+from game.static_files import static_files
+from game.player_storage import STORAGE_SECRET
+from image_variants import IMAGE_VARIANTS_URL, FORMATS, variant_path, start_building_image_variants
 
 # Importera spelet så att /game-routen registreras
 import game.gameWebb  # noqa: F401
 
+# Explicit hälsokontroll, importerna ovan öppnar ingen connection
+check_connection()
+
 print("Creating database tables...")
 # Se till att alla modeller är importerade innan init_db() anropas
 # Genom att importera models-modulen ovan registreras alla modeller i Base.metadata
 init_db()
 print("Database tables created!")
 
-app.add_static_files('/assets', os.path.join(frontend_dir, 'assets'))
+# Låt köade skrivningar (val, registreringar) bli klara innan poolen stängs
+app.on_shutdown(db_writes.shutdown)
+# Stäng poolens connections när appen stängs
+app.on_shutdown(dispose_engine)
+app.on_shutdown(dispose_async_engine)
+# Stäng den delade genai-klienten och dess HTTP-pool
+app.on_shutdown(genai_clients.close)
+
+# Komprimerade, fingeravtryckta statiska filer med ETag och range-stöd
+static_files.mount(app, '/assets', os.path.join(frontend_dir, 'assets'))
+
+# WebP/AVIF-varianter av bilderna byggs i bakgrunden, namnen innehåller innehållshashen
+# så de kan cachas för alltid
+app.on_startup(start_building_image_variants)
+
+@app.get(IMAGE_VARIANTS_URL + '/{name}')
+def serve_image_variant(request: Request, name: str):
+    match = re.fullmatch(r'[\w\-]+-\d+\.[0-9a-f]{16}\.(avif|webp)', name)
+    if not match:
+        raise HTTPException(status_code=404, detail='Not Found')
+    return file_response(request, variant_path(name), etag=name, media_type=FORMATS[match.group(1)][0])
 
 @ui.page('/')
 def landing_page():
@@ -67,4 +98,4 @@ def landing_page():
     create_footer()         
 
 # Runs the app
-ui.run(title='Crisis Mind', port=8080)
+ui.run(title='Crisis Mind', port=8080, storage_secret=STORAGE_SECRET)
@@ -5,22 +5,14 @@ A clean interface for the game engine to fetch and interact with game data.
 This module provides easy-to-use functions that return data in formats
 optimized for the NiceGUI game frontend.
 """
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional
+from collections import defaultdict
 from dataclasses import dataclass, field
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 import logging
 
 # Import your existing modules
-from backend.app.database.crud import (
-    get_scenario,
-    get_choice_options,
-    get_level,
-    get_user,
-    save_user_choice_and_update_attributes,
-    get_user_attributes,
-    create_user
-)
 from backend.app.database.database import SessionLocal
 from backend.app.database import models
 
@@ -112,6 +104,118 @@ def get_db() -> Session:
     return SessionLocal()
 
 
+# -------------------------------------------------------
+# CATALOG QUERIES
+# -------------------------------------------------------
+def _load_catalog(db: Session, *criteria) -> List[tuple]:
+    """
+    Levels, their scenarios and the scenarios' choices in two statements,
+    however many scenarios there are: one levels-scenarios join and one query
+    for all matching choices, grouped per scenario in Python.
+
+    Args:
+        db: Database session
+        *criteria: Filters on models.Scenario columns (applied to both statements)
+
+    Returns:
+        List of (level, scenario or None, choices) ordered by level number and
+        scenario ID, with choices ordered by choice ID. A level without
+        scenarios appears once with scenario None when no criteria are given.
+    """
+    rows = (
+        db.query(models.Level, models.Scenario)
+        .outerjoin(models.Scenario, models.Scenario.level_id == models.Level.level_id)
+        .filter(*criteria)
+        .order_by(models.Level.level_number, models.Level.level_id, models.Scenario.scenario_id)
+        .all()
+    )
+
+    choices_by_scenario = defaultdict(list)
+    if any(scenario is not None for _, scenario in rows):
+        choices = (
+            db.query(models.ChoiceOption)
+            .join(models.Scenario, models.ChoiceOption.scenario_id == models.Scenario.scenario_id)
+            .filter(*criteria)
+            .order_by(models.ChoiceOption.scenario_id, models.ChoiceOption.choice_id)
+            .all()
+        )
+        for choice in choices:
+            choices_by_scenario[choice.scenario_id].append(choice)
+
+    return [
+        (level, scenario, choices_by_scenario.get(scenario.scenario_id, []) if scenario is not None else [])
+        for level, scenario in rows
+    ]
+
+
+def _game_scenario(level: models.Level, scenario: models.Scenario,
+                   choices: List[models.ChoiceOption]) -> GameScenario:
+    return GameScenario(
+        scenario_id=scenario.scenario_id,
+        level_id=scenario.level_id,
+        level_number=level.level_number,
+        level_title=level.title or "",
+        scenario_text=scenario.scenario_text,
+        choices=[
+            GameChoice(
+                choice_id=c.choice_id,
+                text=c.option_text,
+                outcome_text=c.outcome_text,
+                is_correct=c.is_good
+            )
+            for c in choices
+        ],
+        # You can add video/image paths here if you extend the schema
+        video_path=f"videos/scenario_{scenario.scenario_id}.mp4",
+        image_correct=f"images/scenario_{scenario.scenario_id}_correct.png",
+        image_wrong=f"images/scenario_{scenario.scenario_id}_wrong.png"
+    )
+
+
+def _flat_scenario(level: models.Level, scenario: models.Scenario,
+                   choices: List[models.ChoiceOption]) -> Dict:
+    # Find correct and wrong choices
+    correct_choice = next((c for c in choices if c.is_good is True), None)
+    wrong_choice = next((c for c in choices if c.is_good is False), None)
+
+    # Format similar to your original mock.json structure
+    return {
+        'id': scenario.scenario_id,
+        'level_id': scenario.level_id,
+        'level_number': level.level_number,
+        'level_title': level.title,
+        'text': scenario.scenario_text,
+
+        # Choice texts (A and B)
+        'a': choices[0].option_text if len(choices) > 0 else "",
+        'b': choices[1].option_text if len(choices) > 1 else "",
+
+        # Which one is correct ('a' or 'b')
+        'correct': 'a' if (len(choices) > 0 and choices[0].is_good) else 'b',
+
+        # Feedback messages
+        'wrong_msg': wrong_choice.outcome_text if wrong_choice else "",
+        'right_msg': correct_choice.outcome_text if correct_choice else "",
+
+        # All choices with IDs (for saving to database)
+        'choices': [
+            {
+                'choice_id': c.choice_id,
+                'text': c.option_text,
+                'outcome_text': c.outcome_text,
+                'is_good': c.is_good,
+                'label': chr(97 + i)  # 'a', 'b', 'c', etc.
+            }
+            for i, c in enumerate(choices)
+        ],
+
+        # Media paths
+        'video_path': f"videos/scenario_{scenario.scenario_id}.mp4",
+        'video_correct': f"videos/scenario_{scenario.scenario_id}_correct.mp4",
+        'video_wrong': f"videos/scenario_{scenario.scenario_id}_wrong.mp4",
+    }
+
+
 # -------------------------------------------------------
 # GAME DATA FETCHING FUNCTIONS
 # -------------------------------------------------------
@@ -129,35 +233,10 @@ class fetch_Game():
         """
         db = get_db()
         try:
-            scenario = get_scenario(db, scenario_id)
-            if not scenario:
+            catalog = _load_catalog(db, models.Scenario.scenario_id == scenario_id)
+            if not catalog:
                 return None
-
-            level = get_level(db, scenario.level_id)
-            choices = get_choice_options(db, scenario_id)
-
-            game_choices = [
-                GameChoice(
-                    choice_id=c.choice_id,
-                    text=c.option_text,
-                    outcome_text=c.outcome_text,
-                    is_correct=c.is_good
-                )
-                for c in choices
-            ]
-
-            return GameScenario(
-                scenario_id=scenario.scenario_id,
-                level_id=scenario.level_id,
-                level_number=level.level_number if level else 0,
-                level_title=level.title if level else "",
-                scenario_text=scenario.scenario_text,
-                choices=game_choices,
-                # You can add video/image paths here if you extend the schema
-                video_path=f"videos/scenario_{scenario_id}.mp4",
-                image_correct=f"images/scenario_{scenario_id}_correct.png",
-                image_wrong=f"images/scenario_{scenario_id}_wrong.png"
-            )
+            return _game_scenario(*catalog[0])
         except SQLAlchemyError as e:
             logger.error(f"Error fetching scenario {scenario_id}: {e}")
             return None
@@ -177,40 +256,8 @@ class fetch_Game():
         """
         db = get_db()
         try:
-            level = get_level(db, level_id)
-            if not level:
-                return []
-
-            scenarios = db.query(models.Scenario).filter(
-                models.Scenario.level_id == level_id
-            ).order_by(models.Scenario.scenario_id).all()
-
-            game_scenarios = []
-            for scenario in scenarios:
-                choices = get_choice_options(db, scenario.scenario_id)
-                game_choices = [
-                    GameChoice(
-                        choice_id=c.choice_id,
-                        text=c.option_text,
-                        outcome_text=c.outcome_text,
-                        is_correct=c.is_good
-                    )
-                    for c in choices
-                ]
-
-                game_scenarios.append(GameScenario(
-                    scenario_id=scenario.scenario_id,
-                    level_id=level_id,
-                    level_number=level.level_number,
-                    level_title=level.title or "",
-                    scenario_text=scenario.scenario_text,
-                    choices=game_choices,
-                    video_path=f"videos/scenario_{scenario.scenario_id}.mp4",
-                    image_correct=f"images/scenario_{scenario.scenario_id}_correct.png",
-                    image_wrong=f"images/scenario_{scenario.scenario_id}_wrong.png"
-                ))
-
-            return game_scenarios
+            catalog = _load_catalog(db, models.Scenario.level_id == level_id)
+            return [_game_scenario(level, scenario, choices) for level, scenario, choices in catalog]
         except SQLAlchemyError as e:
             logger.error(f"Error fetching level scenarios for level {level_id}: {e}")
             return []
@@ -227,17 +274,18 @@ class fetch_Game():
         """
         db = get_db()
         try:
-            levels = db.query(models.Level).order_by(models.Level.level_number).all()
-
             game_levels = []
-            for level in levels:
-                scenarios = fetch_level_scenarios(level.level_id)
-                game_levels.append(GameLevel(
-                    level_id=level.level_id,
-                    level_number=level.level_number,
-                    title=level.title or "",
-                    scenarios=scenarios
-                ))
+            for level, scenario, choices in _load_catalog(db):
+                # Raderna kommer sorterade per level, en ny level startar en ny GameLevel
+                if not game_levels or game_levels[-1].level_id != level.level_id:
+                    game_levels.append(GameLevel(
+                        level_id=level.level_id,
+                        level_number=level.level_number,
+                        title=level.title or "",
+                        scenarios=[]
+                    ))
+                if scenario is not None:
+                    game_levels[-1].scenarios.append(_game_scenario(level, scenario, choices))
 
             return game_levels
         except SQLAlchemyError as e:
@@ -257,60 +305,12 @@ class fetch_Game():
         """
         db = get_db()
         try:
-            # Get all scenarios ordered by level and scenario ID
-            scenarios = db.query(models.Scenario).join(models.Level).order_by(
-                models.Level.level_number,
-                models.Scenario.scenario_id
-            ).all()
-
-            result = []
-            for scenario in scenarios:
-                choices = get_choice_options(db, scenario.scenario_id)
-                level = get_level(db, scenario.level_id)
-
-                # Find correct and wrong choices
-                correct_choice = next((c for c in choices if c.is_good is True), None)
-                wrong_choice = next((c for c in choices if c.is_good is False), None)
-
-                # Format similar to your original mock.json structure
-                scenario_dict = {
-                    'id': scenario.scenario_id,
-                    'level_id': scenario.level_id,
-                    'level_number': level.level_number if level else 0,
-                    'level_title': level.title if level else "",
-                    'text': scenario.scenario_text,
-
-                    # Choice texts (A and B)
-                    'a': choices[0].option_text if len(choices) > 0 else "",
-                    'b': choices[1].option_text if len(choices) > 1 else "",
-
-                    # Which one is correct ('a' or 'b')
-                    'correct': 'a' if (len(choices) > 0 and choices[0].is_good) else 'b',
-
-                    # Feedback messages
-                    'wrong_msg': wrong_choice.outcome_text if wrong_choice else "",
-                    'right_msg': correct_choice.outcome_text if correct_choice else "",
-
-                    # All choices with IDs (for saving to database)
-                    'choices': [
-                        {
-                            'choice_id': c.choice_id,
-                            'text': c.option_text,
-                            'outcome_text': c.outcome_text,
-                            'is_good': c.is_good,
-                            'label': chr(97 + i)  # 'a', 'b', 'c', etc.
-                        }
-                        for i, c in enumerate(choices)
-                    ],
-
-                    # Media paths
-                    'video_path': f"videos/scenario_{scenario.scenario_id}.mp4",
-                    'video_correct': f"videos/scenario_{scenario.scenario_id}_correct.mp4",
-                    'video_wrong': f"videos/scenario_{scenario.scenario_id}_wrong. mp4",
-                }
-                result.append(scenario_dict)
-
-            return result
+            # Ordered by level number and scenario ID
+            return [
+                _flat_scenario(level, scenario, choices)
+                for level, scenario, choices in _load_catalog(db)
+                if scenario is not None
+            ]
         except SQLAlchemyError as e:
             logger.error(f"Error fetching all scenarios: {e}")
             return []
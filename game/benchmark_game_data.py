@@ -0,0 +1,174 @@
+"""
+Benchmark: ladda scenariokatalogen
+==================================
+Jämför de tidigare fetch_all_scenarios_flat/fetch_all_levels (get_choice_options
+och get_level per scenario, 2N+1 frågor) med de nya som laddar levels,
+scenarier och val i två satser oavsett antal scenarier.
+
+Skriptet lägger till --scenarios scenarier (två val var) fördelade på
+--levels levels, kör varje variant --repeat gånger och tar bort dem efteråt.
+Rapporterar SQL-satser per laddning och p50/max-tid.
+
+    python game/benchmark_game_data.py --scenarios 10000
+"""
+
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import delete, insert, select
+
+from backend.app.database.database import SessionLocal
+from backend.app.database.models import Level, Scenario, ChoiceOption
+from backend.app.database.crud import get_choice_options, get_level
+from backend.app.database.benchmark_choice_commit import RoundTripCounter
+from game.Game_data_Service import fetch_Game, GameChoice, GameLevel, GameScenario, get_db
+from backend.app.database import models
+
+
+BENCHMARK_TITLE = "benchmark-catalog"
+
+
+def legacy_fetch_all_scenarios_flat() -> list:
+    """Den tidigare implementationen (två frågor per scenario), behållen som referens."""
+    db = get_db()
+    try:
+        scenarios = db.query(models.Scenario).join(models.Level).order_by(
+            models.Level.level_number,
+            models.Scenario.scenario_id
+        ).all()
+        result = []
+        for scenario in scenarios:
+            choices = get_choice_options(db, scenario.scenario_id)
+            level = get_level(db, scenario.level_id)
+            result.append({
+                'id': scenario.scenario_id,
+                'level_number': level.level_number if level else 0,
+                'text': scenario.scenario_text,
+                'choices': [c.choice_id for c in choices],
+            })
+        return result
+    finally:
+        db.close()
+
+
+def legacy_fetch_all_levels() -> list:
+    """Den tidigare implementationen (en fråga per scenario och level), med namnfelet rättat."""
+    db = get_db()
+    try:
+        game_levels = []
+        for level in db.query(models.Level).order_by(models.Level.level_number).all():
+            level_db = get_db()
+            try:
+                level_row = get_level(level_db, level.level_id)
+                scenarios = level_db.query(models.Scenario).filter(
+                    models.Scenario.level_id == level.level_id
+                ).order_by(models.Scenario.scenario_id).all()
+                game_scenarios = []
+                for scenario in scenarios:
+                    choices = get_choice_options(level_db, scenario.scenario_id)
+                    game_scenarios.append(GameScenario(
+                        scenario_id=scenario.scenario_id,
+                        level_id=level.level_id,
+                        level_number=level_row.level_number,
+                        level_title=level_row.title or "",
+                        scenario_text=scenario.scenario_text,
+                        choices=[GameChoice(c.choice_id, c.option_text, c.outcome_text, c.is_good) for c in choices]
+                    ))
+            finally:
+                level_db.close()
+            game_levels.append(GameLevel(level.level_id, level.level_number, level.title or "", game_scenarios))
+        return game_levels
+    finally:
+        db.close()
+
+
+def create_fixture(scenarios: int, levels: int) -> list:
+    """Lägger till levels med scenarier och två val per scenario. Returnerar level-ID:na."""
+    db = SessionLocal()
+    try:
+        level_ids = db.execute(
+            insert(Level).returning(Level.level_id),
+            [{"level_number": 1000 + i, "title": BENCHMARK_TITLE} for i in range(levels)]
+        ).scalars().all()
+        scenario_ids = db.execute(
+            insert(Scenario).returning(Scenario.scenario_id),
+            [{"level_id": level_ids[i % levels], "scenario_text": f"benchmark scenario {i}"} for i in range(scenarios)]
+        ).scalars().all()
+        db.execute(insert(ChoiceOption), [
+            {"scenario_id": scenario_id, "option_text": f"option {j}", "outcome_text": f"outcome {j}", "is_good": j == 0}
+            for scenario_id in scenario_ids for j in range(2)
+        ])
+        db.commit()
+        return level_ids
+    finally:
+        db.close()
+
+
+def drop_fixture(level_ids: list):
+    db = SessionLocal()
+    try:
+        scenario_ids = select(Scenario.scenario_id).where(Scenario.level_id.in_(level_ids))
+        db.execute(delete(ChoiceOption).where(ChoiceOption.scenario_id.in_(scenario_ids)))
+        db.execute(delete(Scenario).where(Scenario.level_id.in_(level_ids)))
+        db.execute(delete(Level).where(Level.level_id.in_(level_ids)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def run(label: str, fetch_fn, repeat: int) -> dict:
+    """Kör fetch_fn repeat gånger, mäter tid och SQL-satser per laddning."""
+    engine = SessionLocal().get_bind()
+    counter = RoundTripCounter()
+    timings = []
+    counter.attach(engine)
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fetch_fn()
+            timings.append(time.perf_counter() - start)
+    finally:
+        counter.detach(engine)
+
+    return {
+        "label": label,
+        "rows": len(result),
+        "statements": counter.statements / repeat,
+        "p50_s": statistics.median(timings),
+        "max_s": max(timings),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark för att ladda scenariokatalogen")
+    parser.add_argument("--scenarios", type=int, default=10000, help="Antal scenarier att lägga till")
+    parser.add_argument("--levels", type=int, default=10, help="Antal levels att fördela dem på")
+    parser.add_argument("--repeat", type=int, default=3, help="Laddningar per variant")
+    args = parser.parse_args()
+
+    level_ids = create_fixture(args.scenarios, args.levels)
+    try:
+        print(f"Benchmark: {args.scenarios} scenarier i {args.levels} levels, {args.repeat} laddningar per variant\n")
+        results = [
+            run("flat, before (2N+1)", legacy_fetch_all_scenarios_flat, args.repeat),
+            run("flat, after", fetch_Game.fetch_all_scenarios_flat, args.repeat),
+            run("levels, before", legacy_fetch_all_levels, args.repeat),
+            run("levels, after", fetch_Game.fetch_all_levels, args.repeat),
+        ]
+    finally:
+        drop_fixture(level_ids)
+
+    print(f"{'variant':<22}{'rader':>8}{'satser':>10}{'p50 s':>9}{'max s':>9}")
+    for r in results:
+        print(f"{r['label']:<22}{r['rows']:>8}{r['statements']:>10.0f}{r['p50_s']:>9.3f}{r['max_s']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
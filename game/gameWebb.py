@@ -1,11 +1,33 @@
+import asyncio
+import glob
 import json
 import os
-from nicegui import ui, app
+import re
+import secrets
+import threading
+import time
+from nicegui import ui, app, background_tasks
+from fastapi import HTTPException, Request
 import textwrap
-from backend.app.database.database import SessionLocal
-from backend.app.database.models import Scenario
-from backend.app.database.crud import save_user_choice_and_update_attributes, get_scenario, get_choice_options, get_user
-from ai.video_generation import get_video
+from backend.app.database.database import SessionLocal, AsyncSessionLocal
+from backend.app.database.crud import save_user_choice_and_update_attributes
+from backend.app.database import async_crud
+from sqlalchemy.exc import SQLAlchemyError
+from backend.app.database.write_queue import db_writes
+from ai.video_jobs import video_jobs
+from ai.video_cache import video_cache, VIDEO_MEDIA_URL
+from ai.video_generation import video_generations, resume_video_operations
+from ai.video_operations import video_operations
+from ai.video_renditions import video_renditions, HLS_MEDIA_URL
+from ai.upload_cache import file_digest
+from ai.veo_poller import veo_poller
+from ai.genai_client import genai_clients
+from ai.demographics import demographic_buckets
+from game.media import file_response
+from game.static_files import static_files
+from game.game_sessions import GameSessionManager
+from game.scenario_catalog import scenario_catalog, SCENARIO_CATALOG_ADMIN_TOKEN, SCENARIO_CATALOG_MANUAL_RELOAD_INTERVAL
+from game.player_storage import STORAGE_SECRET, registered_user_id
 
 
 # Hitta rätt sökväg till mock_data
@@ -15,63 +37,12 @@ MOCK_DATA_DIR = os.path.join(PROJECT_ROOT, 'mock_data')  # Använd mock_data/ i
 
 
 # -------------------------------------------------------
-# LOAD JSON SCENARIOS
+# SCENARIOS
 # -------------------------------------------------------
-def load_scenarios():
-    with open(os.path.join(MOCK_DATA_DIR, 'mock.json'), 'r', encoding='utf-8') as f:
-        return json.load(f)["scenarios"]
-
-def load_scenarios_from_db():
-    """Laddar scenarier från databasen och formaterar dem till samma format som mock.json"""
-    db = SessionLocal()
-    try:
-        # Sortera scenarier efter level_id och scenario_id för konsistens
-        scenarios = db.query(Scenario).order_by(Scenario.level_id, Scenario.scenario_id).all()
-        formatted_scenarios = []
-        
-        for scenario in scenarios:
-            # Hämta choice_options för detta scenario, sorterade efter choice_id för konsistens
-            choice_options = get_choice_options(db, scenario.scenario_id)
-            choice_options = sorted(choice_options, key=lambda c: c.choice_id)
-            
-            # Kontrollera att vi har minst 2 val
-            if len(choice_options) < 2:
-                print(f"Varning: Scenario {scenario.scenario_id} har färre än 2 val, hoppar över")
-                continue
-            
-            # Hitta korrekt och felaktigt val
-            correct_choice = next((c for c in choice_options if c.is_good is True), None)
-            wrong_choice = next((c for c in choice_options if c.is_good is False), None)
-            
-            # Bestäm vilket val som är korrekt baserat på index
-            # Ta de första två valen som 'a' och 'b'
-            correct_letter = 'a'
-            if correct_choice and correct_choice == choice_options[1]:
-                correct_letter = 'b'
-            elif correct_choice and correct_choice == choice_options[0]:
-                correct_letter = 'a'
-            elif not correct_choice:
-                # Om inget val är markerat som korrekt, använd första som default
-                correct_letter = 'a'
-            
-            scenario_dict = {
-                'id': scenario.scenario_id,
-                'level_id': scenario.level_id,
-                'text': scenario.scenario_text,
-                'a': choice_options[0].option_text,
-                'b': choice_options[1].option_text,
-                'correct': correct_letter,
-                'right_msg': correct_choice.outcome_text if correct_choice else '',
-                'wrong_msg': wrong_choice.outcome_text if wrong_choice else ''
-            }
-            formatted_scenarios.append(scenario_dict)
-        
-        return formatted_scenarios
-    finally:
-        db.close()
-
-scenarios = load_scenarios()  # Ladda från mock.json
-# scenarios = load_scenarios_from_db()  # Kommenterad - används när DB är klar
+# Scenarierna läses en gång till en delad, oföränderlig katalog (mock.json eller
+# databasen, se SCENARIO_CATALOG_SOURCE) som byts ut atomiskt vid omladdning
+app.on_startup(scenario_catalog.start)
+app.on_shutdown(scenario_catalog.stop)
 
 
 # -------------------------------------------------------
@@ -86,11 +57,19 @@ def wrap_text(text: str, width: int = 40) -> str:
 # GAME LOGIC
 # -------------------------------------------------------
 class GameUI:
-    def __init__(self):
-        self.scenarios = scenarios
+    # Ett objekt per spelare, __slots__ håller det litet
+    __slots__ = ('scenarios', 'index', 'finished', 'answered', 'last_choice_correct', 'video_jobs')
+
+    def __init__(self, scenarios=None):
+        # Sessionen behåller katalogversionen den startade med
+        self.scenarios = scenarios if scenarios is not None else scenario_catalog.current().scenarios
         self.index = 0
         self.finished = False
+        # True från att scenariot besvarats tills nästa startar (feedback visas)
+        self.answered = False
         self.last_choice_correct = None
+        # scenario-index -> VideoJob, både för aktuellt och förhämtat scenario
+        self.video_jobs = {}
 
     @property
     def current(self):
@@ -109,47 +88,210 @@ class GameUI:
     def handle_choice(self, choice: str) -> bool:
         if self.finished:
             return False
-        is_correct = choice == self.current['correct']
+        is_correct = choice == self.current.correct
+        self.answered = True
         self.last_choice_correct = is_correct
         return is_correct
 
     def advance(self):
+        self.answered = False
         self.index += 1
         if self.index >= len(self.scenarios):
             self.finished = True
 
-game = GameUI()
+# Ett spel per ansluten klient istället för ett globalt spel som alla delar
+game_sessions = GameSessionManager(GameUI)
 
 # Lägg till static files för videor
-app.add_static_files('/mock_data', MOCK_DATA_DIR)
+static_files.mount(app, '/mock_data', MOCK_DATA_DIR)
+
+# Genererade videor serveras från cachen via URL med stöd för range-requests,
+# innehållet bestäms av nyckeln så de kan cachas för alltid i webbläsaren
+@app.get(VIDEO_MEDIA_URL + '/{key}.mp4')
+def serve_video(request: Request, key: str):
+    if not re.fullmatch(r'[0-9a-f]{64}', key):
+        raise HTTPException(status_code=404, detail='Not Found')
+    return file_response(request, video_cache.video_path(key), etag=key, media_type='video/mp4')
+
+# HLS-stegen och postern för en video. Stegens hash ingår i URL:en, så en ny stege ger nya URL:er
+HLS_FILE_RE = re.compile(r'(master\.m3u8|poster\.jpg|v\d+/index\.m3u8|v\d+/seg_\d+\.ts)')
+HLS_MEDIA_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+    '.jpg': 'image/jpeg',
+}
+
+@app.get(HLS_MEDIA_URL + '/{ladder}/{key}/{name:path}')
+def serve_hls(request: Request, ladder: str, key: str, name: str):
+    if ladder != video_renditions.ladder_id or not re.fullmatch(r'[0-9a-f]{64}', key) or not HLS_FILE_RE.fullmatch(name):
+        raise HTTPException(status_code=404, detail='Not Found')
+    ext = os.path.splitext(name)[1]
+    cache_control = 'public, max-age=300' if ext == '.m3u8' else 'public, max-age=31536000, immutable'
+    return file_response(request, video_renditions.file_path(key, name), etag=f"{ladder}-{key}-{name.replace('/', '-')}",
+                         cache_control=cache_control, media_type=HLS_MEDIA_TYPES[ext])
+
+# Reservvideornas URL -> innehållshash, som är nyckeln till deras HLS-renditioner
+fallback_rendition_keys = {}
+
+def prepare_fallback_renditions():
+    """Transkodar reservvideorna i mock_data till HLS i bakgrunden (om ffmpeg finns)."""
+    if not video_renditions.enabled:
+        return
+    for path in sorted(glob.glob(os.path.join(MOCK_DATA_DIR, 'video*.mp4'))):
+        key = file_digest(path)
+        fallback_rendition_keys[f'/mock_data/{os.path.basename(path)}'] = key
+        video_renditions.ensure(key, path)
+
+def video_source(url: str, key: str | None = None) -> str:
+    """HLS-spellistan för videon om den är transkodad, annars mp4:an (fingeravtryckt om den är statisk)."""
+    return video_renditions.playlist_url(key or fallback_rendition_keys.get(url)) or static_files.url(url)
+
+app.on_startup(prepare_fallback_renditions)
+
+# Avbryt köade videojobb och stoppa pollern när appen stängs
+app.on_shutdown(video_jobs.shutdown)
+app.on_shutdown(veo_poller.stop)
+app.on_shutdown(video_operations.close)
+app.on_shutdown(video_renditions.shutdown)
+
+# Fortsätt polla Veo-operationer som startades före en omstart
+app.on_startup(resume_video_operations)
+
+def save_choice(user_id: int, level_id: int, scenario_id: int, choice_id: int, has_attributes: bool):
+    """Sparar ett val med attribut-uppdateringar. Körs i db_writes skrivkö, aldrig på event-loopen."""
+    if not has_attributes:
+        print(f"Varning: Choice ID {choice_id} är inte kopplad till några attribut!")
+        print(f"   Attributen kommer inte att uppdateras. Kolla choice_attributes tabellen.")
+
+    db = SessionLocal()
+    try:
+        save_user_choice_and_update_attributes(
+            db,
+            user_id=user_id,
+            level_id=level_id,
+            scenario_id=scenario_id,
+            choice_id=choice_id
+        )
+        print(f"Sparat val: user_id={user_id}, scenario_id={scenario_id}, choice_id={choice_id}")
+    except Exception as e:
+        # Om något går fel, logga men fortsätt spelet
+        print(f"Fel vid sparning till databas: {e}")
+        import traceback
+        traceback.print_exc()
+        raise
+    finally:
+        db.close()
+
 
 # -------------------------------------------------------
 # PAGE UI
 # -------------------------------------------------------
+@app.get('/game/metrics')
+def game_metrics():
+    return {
+        'sessions': game_sessions.stats(),
+        'video_jobs': video_jobs.stats(),
+        'video_cache': video_cache.stats(),
+        'video_generations': video_generations.stats(),
+        'veo_poller': veo_poller.stats(),
+        'genai_client': genai_clients.stats(),
+        'video_operations': video_operations.stats(),
+        'video_renditions': video_renditions.stats(),
+        'demographic_buckets': demographic_buckets.stats(),
+        'static_files': static_files.stats(),
+        'scenario_catalog': scenario_catalog.stats(),
+        'db_writes': db_writes.stats(),
+    }
+
+
+# Senaste manuella omladdningen, en omladdning från databasen är tre frågor över hela katalogen
+_catalog_reload_lock = threading.Lock()
+_catalog_reloaded_at = 0.0
+
+@app.post('/game/catalog/reload')
+def reload_scenario_catalog(request: Request):
+    global _catalog_reloaded_at
+    if SCENARIO_CATALOG_ADMIN_TOKEN:
+        allowed = secrets.compare_digest(request.headers.get('x-admin-token', ''), SCENARIO_CATALOG_ADMIN_TOKEN)
+    else:
+        allowed = request.client is not None and request.client.host in ('127.0.0.1', '::1')
+    if not allowed:
+        raise HTTPException(status_code=403, detail='Forbidden')
+
+    with _catalog_reload_lock:
+        wait = _catalog_reloaded_at + SCENARIO_CATALOG_MANUAL_RELOAD_INTERVAL - time.monotonic()
+        if wait > 0:
+            raise HTTPException(status_code=429, detail='Too Many Requests', headers={'Retry-After': str(int(wait) + 1)})
+        _catalog_reloaded_at = time.monotonic()
+
+    changed = scenario_catalog.reload()
+    return {'changed': changed, **scenario_catalog.stats()}
+
+
+async def load_player(user_id: int | None) -> tuple[int | None, dict]:
+    """Hämtar den registrerade spelaren och dess user_info, (None, ...) utan registrering."""
+    user = None
+    if user_id:
+        try:
+            async with AsyncSessionLocal() as db:
+                user = await async_crud.get_user(db, user_id)
+        except (SQLAlchemyError, OSError) as e:
+            # Utan databas går det ändå att spela, valen sparas bara inte
+            print(f"Varning: Kunde inte hämta användaren {user_id}: {e}")
+    if user:
+        print(f"Använder användaren: user_id={user.user_id} ({user.username})")
+        return user.user_id, {"age": user.age, "gender": user.gender}
+    print("Varning: Ingen användare hittades. Spela kommer att fungera men val sparas inte.")
+    return None, {"age": None, "gender": None}
+
+
 @ui.page('/game')
-def index():
+async def index():
+    # Ålder och kön från registreringen avgör vilken (cachad) video spelaren får.
+    # Spelaren kommer från webbläsarens lagring, aldrig från URL:en
+    current_user_id, user_info = await load_player(registered_user_id())
+
+    client_id = ui.context.client.id
+    game = game_sessions.get_or_create(client_id)
+    # Sessionen släpps när klienten tas bort, inte vid varje tillfälligt avbrott som kan återanslutas
+    ui.context.client.on_delete(lambda: game_sessions.discard(client_id))
+
     ui.add_head_html("""
     <link href="https://cdnjs.cloudflare.com/ajax/libs/JetBrainsMono/2.304.0/jetbrains-mono.min.css" rel="stylesheet">
     <style>
         .font-jetbrains { font-family: 'JetBrains Mono', monospace !important; }
     </style>
+    <script src="https://cdn.jsdelivr.net/npm/hls.js@1.5.20/dist/hls.min.js"></script>
+    <script>
+        // HLS spelas nativt i Safari, i övriga webbläsare via hls.js; mp4 sätts som vanligt
+        window.playScenarioVideo = function (id, src, poster) {
+            const el = getHtmlElement(id);
+            if (el._hls) {
+                el._hls.destroy();
+                el._hls = null;
+            }
+            el.poster = poster || '';
+            if (src.endsWith('.m3u8') && !el.canPlayType('application/vnd.apple.mpegurl') && window.Hls && Hls.isSupported()) {
+                const hls = new Hls({ capLevelToPlayerSize: true });
+                hls.loadSource(src);
+                hls.attachMedia(el);
+                el._hls = hls;
+            } else {
+                el.src = src;
+            }
+            el.play().catch(() => {});
+        };
+    </script>
     """)
 
     with ui.element('div').classes('w-full h-screen overflow-hidden'):
-        # TODO: fixa så att det hämtas från frontend/backend
-        user_info = {
-            "age": "21",
-            "gender": "male",
-        }
-        # Frivilligt, om man vill att videosen ska sparas lokalt
-        video_save_folder = "videos/"
-
-        # Video element
-        video_info = get_video(user_info, 1, video_save_folder)
-        if video_info["video_exists"]:
-            video = ui.video(video_info["video_bytes"]).classes('absolute inset-0 w-full h-full object-cover')
-        else:
-            video = ui.video(f'/mock_data/video0.mp4').classes('absolute inset-0 w-full h-full object-cover')
+        # Video element - reservvideon spelas direkt, den genererade byts in när den är klar
+        video = ui.video(static_files.url(game.video_path(correct=True))).classes('absolute inset-0 w-full h-full object-cover')
+
+        # Dold video som förladdar nästa scenarios video medan det nuvarande spelas
+        preload_video = ui.video('', controls=False, muted=True).props('preload=auto').style(
+            'position: absolute; width: 1px; height: 1px; opacity: 0; pointer-events: none'
+        )
 
         # CHOICE OVERLAY
         with ui.column().classes(
@@ -214,6 +356,10 @@ def index():
 
     # EVENT HANDLERS
     def on_video_ended():
+        game_sessions.touch(client_id)
+        # Under feedbacken ska valen inte visas igen
+        if game.answered:
+            return
         if game.finished:
             end_overlay.visible = True
             return
@@ -225,124 +371,63 @@ def index():
     def update_choice_ui():
         current = game.current
         title_label.text = f"SCENARIO {game.index + 1}"
-        text_label.text = current['text']
-        text_a.text = wrap_text(current['a'])
-        text_b.text = wrap_text(current['b'])
-
-    # Hämta den senaste användaren från databasen
-    def get_current_user_id():
-        """Hämtar den senaste användaren från databasen."""
-        db = SessionLocal()
-        try:
-            from backend.app.database.models import User
-            from sqlalchemy import desc
-            latest_user = db.query(User).order_by(desc(User.user_id)).first()
-            if latest_user:
-                print(f"Använder senaste användaren: user_id={latest_user.user_id} ({latest_user.username})")
-                return latest_user.user_id
-            else:
-                print("Varning: Ingen användare hittades. Spela kommer att fungera men val sparas inte.")
-                return None
-        finally:
-            db.close()
-    
-    current_user_id = get_current_user_id()
+        text_label.text = current.text
+        text_a.text = wrap_text(current.a)
+        text_b.text = wrap_text(current.b)
+
 
     def on_click(choice: str):
+        game_sessions.touch(client_id)
+        # Ett scenario besvaras (och sparas) bara en gång, även vid dubbelklick
+        if game.answered or game.finished:
+            return
         is_correct = game.handle_choice(choice)
         current = game.current
 
-        # Spara användarens svar i databasen
-        try:
-            # Hantera både 'id' (mock.json) och 'scenario_id' (databas)
-            scenario_id = current.get('id') or current.get('scenario_id')
-            scenario_text = current.get('text', '')
-            
-            if not scenario_text:
-                print("Varning: Scenario saknar 'text', hoppar över databas-sparning")
-            else:
-                db = SessionLocal()
-                try:
-                    print(f"Försöker spara val för scenario (text: '{scenario_text[:50]}...'), user_id={current_user_id}")
-                    
-                    # Försök hitta scenario i DB baserat på text (eftersom mock.json ID:n kanske inte matchar DB ID:n)
-                    from backend.app.database.models import Scenario
-                    scenario_db = db.query(Scenario).filter(Scenario.scenario_text == scenario_text).first()
-                    
-                    # Om inte hittat med text, försök med ID om det finns
-                    if not scenario_db and scenario_id:
-                        scenario_db = get_scenario(db, scenario_id)
-                    
-                    if not scenario_db:
-                        # Tyst hoppa över om scenario inte finns i databasen
-                        pass
-                    elif not current_user_id:
-                        print(f"Varning: Ingen användare hittades. Valet kommer inte att sparas.")
-                        print(f"   Registrera dig först via frontend för att spara dina val.")
-                    else:
-                        level_id = scenario_db.level_id
-                        db_scenario_id = scenario_db.scenario_id
-                        print(f"Hittade scenario i DB: scenario_id={db_scenario_id}, level_id={level_id}")
-                        
-                        # Hämta alla choice_options för detta scenario
-                        choice_options = get_choice_options(db, db_scenario_id)
-                        
-                        # Matcha valet ('a' eller 'b') med rätt choice_id baserat på texten
-                        choice_text = current[choice]  # 'a' eller 'b' text
-                        choice_id = None
-                        
-                        # Hitta choice_id som matchar valets text
-                        for co in choice_options:
-                            if co.option_text.strip() == choice_text.strip():
-                                choice_id = co.choice_id
-                                break
-                        
-                        # Om vi hittar ett matchande val, spara det
-                        if choice_id:
-                            # Kolla vilka attribut som kommer att påverkas
-                            from backend.app.database.crud import get_choice_attributes
-                            choice_attrs = get_choice_attributes(db, choice_id)
-                            
-                            if choice_attrs:
-                                print(f"Hittat {len(choice_attrs)} attribut som kommer att påverkas för choice_id {choice_id}")
-                            else:
-                                print(f"Varning: Choice ID {choice_id} är inte kopplad till några attribut!")
-                                print(f"   Attributen kommer inte att uppdateras. Kolla choice_attributes tabellen.")
-                            
-                            save_user_choice_and_update_attributes(
-                                db,
-                                user_id=current_user_id,
-                                level_id=level_id,
-                                scenario_id=db_scenario_id,
-                                choice_id=choice_id
-                            )
-                            print(f"Sparat val: user_id={current_user_id}, scenario_id={db_scenario_id}, choice_id={choice_id}")
-                        else:
-                            print(f"Varning: Kunde inte hitta matchande choice_id för val '{choice}' i scenario {db_scenario_id}")
-                finally:
-                    db.close()
-        except Exception as e:
-            # Om något går fel, logga men fortsätt spelet
-            print(f"Fel vid sparning till databas: {e}")
-            import traceback
-            traceback.print_exc()
-            if 'db' in locals():
-                db.close()
-
         choice_overlay.visible = False
 
         if is_correct:
-            # Hantera både 'right_msg' (mock.json) och andra format
-            msg = current.get('right_msg') or current.get('correct_msg') or 'Rätt val!'
+            msg = current.right_msg or 'Rätt val!'
             correct_msg_label.text = msg
             correct_overlay.visible = True
         else:
-            # Hantera både 'wrong_msg' (mock.json) och andra format
-            msg = current.get('wrong_msg') or current.get('incorrect_msg') or 'Fel val!'
+            msg = current.wrong_msg or 'Fel val!'
             wrong_msg_label.text = msg
             wrong_overlay.visible = True
 
+        # Spara användarens svar i databasen i bakgrunden, UI:t har redan visat resultatet.
+        # Katalogen har redan scenario_id, level_id och choice_id, så det blir inga uppslag
+        selected = current.choice(choice)
+        if current.scenario_id is None or selected is None or selected.choice_id is None:
+            # Tyst hoppa över om scenario inte finns i databasen
+            return
+        if not current_user_id:
+            print(f"Varning: Ingen användare hittades. Valet kommer inte att sparas.")
+            print(f"   Registrera dig först via frontend för att spara dina val.")
+            return
+
+        future = db_writes.submit(
+            'save_choice', save_choice,
+            current_user_id, current.level_id, current.scenario_id, selected.choice_id, bool(selected.attribute_deltas)
+        )
+        if future is None:
+            # Skrivkön är full: spelet fortsätter men valet sparas inte
+            ui.notify('Hög belastning just nu, ditt val kunde inte sparas', type='warning')
+        else:
+            background_tasks.create(confirm_saved(future), name='save-choice')
+
+    async def confirm_saved(future):
+        try:
+            await asyncio.wrap_future(future)
+        except Exception:
+            with video:
+                ui.notify('Ditt val kunde inte sparas', type='warning')
+
     def proceed_to_next():
+        game_sessions.touch(client_id)
+        # Ett dubbelklick på feedbacken får inte hoppa över ett scenario
+        if not game.answered:
+            return
         correct_overlay.visible = False
         wrong_overlay.visible = False
         game.advance()
@@ -350,14 +435,60 @@ def index():
         if game.finished:
             end_overlay.visible = True
         else:
-            video_info = get_video(user_info, game.index, video_save_folder)
-            if video_info["video_exists"]:
-                video.set_source(video_info["video_bytes"])
-            else:
-                video.set_source(game.video_path(correct=True))
+            start_scenario()
+
+    playing = {'src': static_files.url(game.video_path(correct=True))}
+
+    def play(url: str, key: str | None = None):
+        # HLS-stegen om den finns, så att bandbredden anpassas efter klienten
+        src = video_source(url, key)
+        # Byt bara källa om den är ny, annars startar videon om från början
+        if playing['src'] != src:
+            playing['src'] = src
+            poster = video_renditions.poster_url(key or fallback_rendition_keys.get(url))
+            video.client.run_javascript(f'playScenarioVideo({video.id}, {json.dumps(src)}, {json.dumps(poster)})')
+        else:
             video.run_method('play')
 
-    video.run_method('play')
+    def start_scenario():
+        """Spelar scenariots video och börjar förhämta nästa scenarios video."""
+        job = request_video(game.index)
+        # Förhämtad och klar: webbläsaren har redan laddat den i den dolda videon
+        video_info = job.result() if job and job.done() and not job.future.exception() else None
+        if video_info and video_info["video_exists"]:
+            play(video_info["url"], video_info.get("cache_key"))
+        else:
+            play(game.video_path(correct=True))
+
+        if game.index + 1 < len(game.scenarios):
+            request_video(game.index + 1)
+
+    def request_video(index: int):
+        """Köar generering av videon för scenariot om den inte redan är begärd."""
+        job = game.video_jobs.get(index)
+        if job is None:
+            job = video_jobs.submit(user_info, index + 1)
+            if job is None:
+                return None
+            game.video_jobs[index] = job
+            background_tasks.create(on_video_ready(job, index), name=f'video-job-{job.job_id}')
+        return job
+
+    async def on_video_ready(job, index: int):
+        try:
+            video_info = await job.wait()
+        except Exception:
+            return
+        if not video_info["video_exists"] or game.finished:
+            return
+        if game.index == index and not game.answered:
+            # Spelaren tittar fortfarande på scenariot, byt in den genererade videon
+            play(video_info["url"], video_info.get("cache_key"))
+        elif game.index + 1 == index and video_source(video_info["url"], video_info.get("cache_key")) == video_info["url"]:
+            # Bara mp4 förladdas, HLS startar snabbt ändå och hämtar bara det steg som behövs
+            preload_video.set_source(video_info["url"])
+
+    start_scenario()
 
 if __name__ in ('__main__', '__mp_main__'):
-    ui.run(title='Crisis Game')
\ No newline at end of file
+    ui.run(title='Crisis Game', storage_secret=STORAGE_SECRET)
\ No newline at end of file
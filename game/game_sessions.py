@@ -0,0 +1,116 @@
+"""
+Game Sessions
+-------------
+Ett litet spelläge per ansluten spelare i stället för ett globalt spel som
+delas av alla webbläsare. Nyckeln är NiceGUI:s klient-id.
+
+Sessionen tas bort när klienten försvinner. Sessioner som varit inaktiva
+längre än TTL:en (övergivna flikar) rensas, och när taket nås får den som
+använts minst nyligen ge plats.
+"""
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+GAME_SESSION_TTL_SECONDS = int(os.getenv("GAME_SESSION_TTL_SECONDS", "1800"))
+GAME_SESSION_MAX = int(os.getenv("GAME_SESSION_MAX", "10000"))
+
+
+class GameSessionManager:
+    """Trådsäker TTL/LRU-lagring av spelläge per spelare."""
+
+    def __init__(self,
+                 factory: Callable[[], Any],
+                 ttl_seconds: int = GAME_SESSION_TTL_SECONDS,
+                 max_sessions: int = GAME_SESSION_MAX):
+        self._factory = factory
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        # key -> (session, last_seen), äldst först
+        self._sessions: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._evicted_ttl = 0
+        self._evicted_lru = 0
+        self._peak = 0
+
+    def get_or_create(self, key: Hashable) -> Any:
+        """Sessionen för key, skapas om den saknas."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            entry = self._sessions.get(key)
+            if entry is not None:
+                entry[1] = now
+                self._sessions.move_to_end(key)
+                return entry[0]
+
+            while len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._evicted_lru += 1
+
+            session = self._factory()
+            self._sessions[key] = [session, now]
+            self._created += 1
+            self._peak = max(self._peak, len(self._sessions))
+            return session
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Sessionen för key, eller None. Skapar ingen ny."""
+        with self._lock:
+            entry = self._sessions.get(key)
+            return entry[0] if entry is not None else None
+
+    def touch(self, key: Hashable) -> None:
+        """Markerar sessionen som aktiv så att den inte rensas som övergiven."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None:
+                entry[1] = now
+                self._sessions.move_to_end(key)
+
+    def discard(self, key: Hashable) -> None:
+        """Tar bort sessionen för key, t.ex. när klienten kopplats ner för gott."""
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def sweep(self) -> int:
+        """Rensar alla utgångna sessioner och returnerar hur många som togs bort."""
+        with self._lock:
+            return self._evict_expired(time.monotonic())
+
+    def _evict_expired(self, now: float) -> int:
+        # LRU-ordningen gör att de äldsta ligger först, så vi kan sluta vid första levande
+        evicted = 0
+        while self._sessions:
+            key, (_, last_seen) = next(iter(self._sessions.items()))
+            if now - last_seen < self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+            evicted += 1
+        self._evicted_ttl += evicted
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            live = len(self._sessions)
+            sample = next(iter(self._sessions.values()), None)
+            session_bytes = sys.getsizeof(sample[0]) if sample else 0
+            return {
+                "live": live,
+                "peak": self._peak,
+                "created": self._created,
+                "evicted_ttl": self._evicted_ttl,
+                "evicted_lru": self._evicted_lru,
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "approx_bytes": live * session_bytes,
+            }
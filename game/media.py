@@ -0,0 +1,106 @@
+"""
+Media serving
+-------------
+File responses with HTTP range support, ETag validation and cache headers,
+used for the generated scenario videos so the browser can stream and seek
+instead of receiving the whole mp4 inside the websocket payload.
+"""
+import os
+import re
+import mimetypes
+from typing import Iterator, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+
+CHUNK_SIZE = 256 * 1024
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _read_chunks(path: str, start: int, length: int) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple]:
+    """Parses a single 'bytes=start-end' range. Returns (start, end) inclusive, or None if unsatisfiable."""
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix-range: de sista N byten
+        length = int(last)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def file_response(request: Request,
+                  path: str,
+                  etag: str,
+                  cache_control: str = IMMUTABLE_CACHE_CONTROL,
+                  media_type: Optional[str] = None,
+                  extra_headers: Optional[dict] = None) -> Response:
+    """
+    Serves a file with conditional (If-None-Match) and single range request support.
+
+    Args:
+        request: The incoming request
+        path: Local file path
+        etag: Strong validator for the file content, without quotes
+        cache_control: Cache-Control header value
+        media_type: Content type, guessed from the file name if not given
+        extra_headers: Additional headers, e.g. Content-Encoding
+
+    Returns:
+        304, 206, 416 or 200 response
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        raise HTTPException(status_code=404, detail='Not Found')
+
+    media_type = media_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    headers = {
+        'ETag': f'"{etag}"',
+        'Cache-Control': cache_control,
+        'Accept-Ranges': 'bytes',
+        **(extra_headers or {}),
+    }
+
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match and (if_none_match.strip() == '*' or f'"{etag}"' in if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get('range')
+    if_range = request.headers.get('if-range')
+    if range_header and (not if_range or if_range.strip() == f'"{etag}"'):
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            return Response(status_code=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+        start, end = byte_range
+        length = end - start + 1
+        headers.update({'Content-Range': f'bytes {start}-{end}/{size}', 'Content-Length': str(length)})
+        return StreamingResponse(_read_chunks(path, start, length), status_code=206,
+                                 media_type=media_type, headers=headers)
+
+    headers['Content-Length'] = str(size)
+    if request.method == 'HEAD':
+        return Response(status_code=200, media_type=media_type, headers=headers)
+    return StreamingResponse(_read_chunks(path, 0, size), media_type=media_type, headers=headers)
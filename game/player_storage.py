@@ -0,0 +1,37 @@
+"""
+Player Storage
+--------------
+Which registered user a browser plays as. The user_id is kept server-side in
+app.storage.user (NiceGUI's per-browser storage, identified by a signed
+cookie) when registration succeeds, and /game reads it from there. It is
+never taken from the URL, so a client can't write choices to, or read the
+demographics of, another user's account.
+
+app.storage.user needs ui.run(storage_secret=STORAGE_SECRET). Without
+STORAGE_SECRET in .env a random secret is generated per process, which means
+registrations are forgotten on restart.
+"""
+import os
+import secrets
+from typing import Optional
+
+from dotenv import load_dotenv
+from nicegui import app
+
+
+load_dotenv()
+
+STORAGE_SECRET = os.getenv('STORAGE_SECRET') or secrets.token_urlsafe(32)
+
+PLAYER_USER_ID_KEY = 'user_id'
+
+
+def remember_player(user_id: int) -> None:
+    """Binds the current browser to user_id. Call from a page or event handler."""
+    app.storage.user[PLAYER_USER_ID_KEY] = user_id
+
+
+def registered_user_id() -> Optional[int]:
+    """The user_id this browser registered as, or None."""
+    user_id = app.storage.user.get(PLAYER_USER_ID_KEY)
+    return user_id if isinstance(user_id, int) else None
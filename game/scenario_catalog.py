@@ -0,0 +1,414 @@
+"""
+Scenario Catalog
+----------------
+Read-only, in-process copy of the game content: scenarios, their choices and
+the attribute deltas of each choice. It is loaded once into frozen, slotted
+structures that every session shares, so gameplay reads never touch the
+database or disk.
+
+The content comes from mock.json (SCENARIO_CATALOG_SOURCE=mock, default) or
+from the database (SCENARIO_CATALOG_SOURCE=db). A reload builds a complete new
+snapshot and swaps it in with a single assignment. The version is bumped only
+when the content actually changed. Sessions keep the snapshot they started
+with, so a reload never changes a game in progress.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict, replace
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCK_JSON_PATH = os.path.join(PROJECT_ROOT, 'mock_data', 'mock.json')
+
+SCENARIO_CATALOG_SOURCE = os.getenv('SCENARIO_CATALOG_SOURCE', 'mock')
+# Hur ofta mock.json:s mtime kontrolleras i bakgrunden (sekunder, 0 = aldrig)
+SCENARIO_CATALOG_RELOAD_INTERVAL = float(os.getenv('SCENARIO_CATALOG_RELOAD_INTERVAL', '2'))
+# Hur ofta katalogen läses om från databasen (sekunder, 0 = bara vid start och via /game/catalog/reload)
+SCENARIO_CATALOG_DB_RELOAD_INTERVAL = float(os.getenv('SCENARIO_CATALOG_DB_RELOAD_INTERVAL', '0'))
+# Hur ofta databas-ID:n försöks slås upp igen när databasen inte svarade (sekunder)
+SCENARIO_CATALOG_RETRY_INTERVAL = float(os.getenv('SCENARIO_CATALOG_RETRY_INTERVAL', '5'))
+# POST /game/catalog/reload: token i X-Admin-Token (utan token bara från localhost) och minsta tid mellan anrop
+SCENARIO_CATALOG_ADMIN_TOKEN = os.getenv('SCENARIO_CATALOG_ADMIN_TOKEN', '')
+SCENARIO_CATALOG_MANUAL_RELOAD_INTERVAL = float(os.getenv('SCENARIO_CATALOG_MANUAL_RELOAD_INTERVAL', '10'))
+
+CHOICE_LABELS = 'abcdefghijklmnopqrstuvwxyz'
+
+
+@dataclass(frozen=True, slots=True)
+class AttributeDelta:
+    attribute_id: int
+    name: str
+    score_change: int
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogChoice:
+    label: str  # 'a', 'b', ...
+    text: str
+    outcome_text: str
+    is_good: Optional[bool]
+    choice_id: Optional[int] = None  # None när valet inte finns i databasen
+    attribute_deltas: Tuple[AttributeDelta, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogScenario:
+    id: int
+    level_id: Optional[int]
+    title: str
+    text: str
+    choices: Tuple[CatalogChoice, ...]
+    correct: str  # etiketten för det rätta valet
+    right_msg: str
+    wrong_msg: str
+    # Databasens scenario_id, None när scenariot inte finns i databasen
+    scenario_id: Optional[int] = None
+
+    @property
+    def a(self) -> str:
+        return self.choices[0].text
+
+    @property
+    def b(self) -> str:
+        return self.choices[1].text
+
+    def choice(self, label: str) -> Optional[CatalogChoice]:
+        return next((c for c in self.choices if c.label == label), None)
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogSnapshot:
+    version: int
+    digest: str  # sha256 över innehållet, avgör om en omladdning gav något nytt
+    source: str
+    loaded_at: float
+    scenarios: Tuple[CatalogScenario, ...]
+    by_id: Mapping[int, CatalogScenario]
+    # False när databasen inte gick att nå och ID:n saknas, då försöker watchern igen
+    resolved: bool = True
+
+
+def content_digest(scenarios: Tuple[CatalogScenario, ...]) -> str:
+    payload = json.dumps([asdict(s) for s in scenarios], ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_from_mock(path: str = MOCK_JSON_PATH) -> Tuple[CatalogScenario, ...]:
+    """Scenarios from mock.json, without database IDs (see resolve_database_ids)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    scenarios = []
+    for item in data['scenarios']:
+        correct = item['correct']
+        choices = tuple(
+            CatalogChoice(
+                label=label,
+                text=item[label],
+                outcome_text=item['right_msg'] if label == correct else item['wrong_msg'],
+                is_good=label == correct,
+            )
+            for label in ('a', 'b')
+        )
+        scenarios.append(CatalogScenario(
+            id=item['id'],
+            level_id=item.get('level_id'),
+            title=item.get('title', ''),
+            text=item['text'],
+            choices=choices,
+            correct=correct,
+            right_msg=item['right_msg'],
+            wrong_msg=item['wrong_msg'],
+        ))
+    return tuple(scenarios)
+
+
+def _attribute_deltas(db, choice_ids=None) -> dict:
+    """choice_id -> [AttributeDelta] in one statement, for all choices or the given ones."""
+    from backend.app.database import models
+
+    query = db.query(
+        models.choice_attributes.c.choice_id,
+        models.Attribute.attribute_id,
+        models.Attribute.name,
+        models.choice_attributes.c.score_change
+    ).join(
+        models.Attribute,
+        models.Attribute.attribute_id == models.choice_attributes.c.attribute_id
+    )
+    if choice_ids is not None:
+        query = query.filter(models.choice_attributes.c.choice_id.in_(choice_ids))
+
+    deltas = {}
+    for choice_id, attribute_id, name, score_change in query.order_by(
+            models.choice_attributes.c.choice_id, models.Attribute.attribute_id):
+        deltas.setdefault(choice_id, []).append(AttributeDelta(attribute_id, name, score_change))
+    return deltas
+
+
+def resolve_database_ids(scenarios: Tuple[CatalogScenario, ...]) -> Tuple[CatalogScenario, ...]:
+    """
+    Attaches scenario_id, level_id and per-letter choice_id (plus attribute
+    deltas) from the database to mock scenarios. Scenarios are matched on the
+    indexed content_hash and choices on their text, falling back to position.
+    Two statements in total. Scenarios that are not in the database keep
+    the IDs as None; database errors are raised to the caller.
+    """
+    from backend.app.database.database import SessionLocal
+    from backend.app.database.models import Scenario, ChoiceOption, scenario_content_hash
+
+    hashes = [scenario_content_hash(s.text) for s in scenarios]
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            Scenario.content_hash, Scenario.scenario_id, Scenario.level_id,
+            ChoiceOption.choice_id, ChoiceOption.option_text
+        ).join(
+            ChoiceOption, ChoiceOption.scenario_id == Scenario.scenario_id
+        ).filter(
+            Scenario.content_hash.in_(set(hashes))
+        ).order_by(Scenario.scenario_id, ChoiceOption.choice_id).all()
+
+        # content_hash -> (scenario_id, level_id, [(choice_id, text)]), lägsta scenario_id vinner vid dubbletter
+        matches = {}
+        for content_hash, scenario_id, level_id, choice_id, option_text in rows:
+            match = matches.setdefault(content_hash, (scenario_id, level_id, []))
+            if match[0] == scenario_id:
+                match[2].append((choice_id, option_text.strip()))
+
+        deltas = _attribute_deltas(db, [c for match in matches.values() for c, _ in match[2]]) if matches else {}
+    finally:
+        db.close()
+
+    resolved = []
+    for content_hash, scenario in zip(hashes, scenarios):
+        match = matches.get(content_hash)
+        if match is None:
+            resolved.append(scenario)
+            continue
+        scenario_id, level_id, options = match
+        by_text = {text: choice_id for choice_id, text in options}
+        choices = []
+        for i, choice in enumerate(scenario.choices):
+            choice_id = by_text.get(choice.text.strip())
+            if choice_id is None and i < len(options):
+                choice_id = options[i][0]
+            choices.append(replace(
+                choice,
+                choice_id=choice_id,
+                attribute_deltas=tuple(deltas.get(choice_id, ()))
+            ))
+        resolved.append(replace(scenario, scenario_id=scenario_id, level_id=level_id, choices=tuple(choices)))
+    return tuple(resolved)
+
+
+def load_from_db() -> Tuple[CatalogScenario, ...]:
+    """Scenarios, choices and attribute deltas from the database in three statements."""
+    from backend.app.database.database import SessionLocal
+    from game.Game_data_Service import _load_catalog
+
+    db = SessionLocal()
+    try:
+        catalog = _load_catalog(db)
+        deltas = _attribute_deltas(db)
+    finally:
+        db.close()
+
+    scenarios = []
+    for level, scenario, options in catalog:
+        if scenario is None:
+            continue
+        # Spelet visar två val, a och b
+        if len(options) < 2:
+            print(f"Varning: Scenario {scenario.scenario_id} har färre än 2 val, hoppar över")
+            continue
+
+        choices = tuple(
+            CatalogChoice(
+                label=CHOICE_LABELS[i],
+                text=option.option_text,
+                outcome_text=option.outcome_text,
+                is_good=option.is_good,
+                choice_id=option.choice_id,
+                attribute_deltas=tuple(deltas.get(option.choice_id, ())),
+            )
+            for i, option in enumerate(options[:len(CHOICE_LABELS)])
+        )
+        correct_choice = next((c for c in choices if c.is_good is True), None)
+        wrong_choice = next((c for c in choices if c.is_good is False), None)
+        scenarios.append(CatalogScenario(
+            id=scenario.scenario_id,
+            level_id=scenario.level_id,
+            title=level.title or '',
+            text=scenario.scenario_text,
+            choices=choices,
+            # Om inget val är markerat som korrekt används det första
+            correct=correct_choice.label if correct_choice else 'a',
+            right_msg=correct_choice.outcome_text if correct_choice else '',
+            wrong_msg=wrong_choice.outcome_text if wrong_choice else '',
+            scenario_id=scenario.scenario_id,
+        ))
+    return tuple(scenarios)
+
+
+class ScenarioCatalog:
+    """
+    Holds the current CatalogSnapshot. current() is a plain attribute read;
+    reload() builds a new snapshot off to the side and swaps it in only if
+    its content differs. A failed reload keeps the previous snapshot.
+    """
+
+    def __init__(self,
+                 source: str = SCENARIO_CATALOG_SOURCE,
+                 mock_path: str = MOCK_JSON_PATH,
+                 reload_interval: float = SCENARIO_CATALOG_RELOAD_INTERVAL,
+                 db_reload_interval: float = SCENARIO_CATALOG_DB_RELOAD_INTERVAL):
+        if source not in ('mock', 'db'):
+            raise ValueError(f"SCENARIO_CATALOG_SOURCE must be 'mock' or 'db', not {source!r}")
+        self.source = source
+        self.mock_path = mock_path
+        self.reload_interval = reload_interval if source == 'mock' else db_reload_interval
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self._mtime = None
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._reloads = 0
+        self._unchanged = 0
+        self._failures = 0
+        self._last_error = ''
+
+    def current(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.reload()
+            snapshot = self._snapshot
+        return snapshot
+
+    def _load(self) -> Tuple[Tuple[CatalogScenario, ...], bool]:
+        """The scenarios and whether their database IDs could be looked up."""
+        if self.source == 'db':
+            return load_from_db(), True
+
+        mtime = os.stat(self.mock_path).st_mtime_ns
+        scenarios = load_from_mock(self.mock_path)
+        resolved = True
+        try:
+            scenarios = resolve_database_ids(scenarios)
+        except Exception as e:
+            # Finns en version med ID:n behålls den, annars spelas katalogen utan (val sparas inte) tills databasen svarar
+            previous = self._snapshot
+            if previous is not None and previous.resolved:
+                raise
+            if previous is None:
+                print(f"Varning: Kunde inte slå upp scenariernas ID:n i databasen, val sparas inte förrän den svarar: {e}")
+            self._last_error = repr(e)
+            resolved = False
+        # Sätts först när inläsningen lyckats, annars försöker watchern igen
+        self._mtime = mtime
+        return scenarios, resolved
+
+    def reload(self) -> bool:
+        """Loads the source again. Returns True if a new version was swapped in."""
+        with self._reload_lock:
+            previous = self._snapshot
+            try:
+                scenarios, resolved = self._load()
+                if not scenarios:
+                    raise ValueError('catalog is empty')
+            except Exception as e:
+                self._failures += 1
+                self._last_error = repr(e)
+                if previous is None:
+                    raise
+                print(f"Could not reload scenario catalog, keeping version {previous.version}: {e}")
+                return False
+
+            digest = content_digest(scenarios)
+            if previous is not None and previous.digest == digest and previous.resolved == resolved:
+                self._unchanged += 1
+                return False
+
+            # Hela snapshoten byggs färdig innan den byts in med en enda tilldelning
+            self._snapshot = CatalogSnapshot(
+                version=previous.version + 1 if previous else 1,
+                digest=digest,
+                source=self.source,
+                loaded_at=time.time(),
+                scenarios=scenarios,
+                by_id=MappingProxyType({s.id: s for s in scenarios}),
+                resolved=resolved,
+            )
+            self._reloads += 1
+            if previous is not None:
+                print(f"Reloaded scenario catalog from {self.source} (version {self._snapshot.version})")
+            return True
+
+    def _resolved(self) -> bool:
+        snapshot = self._snapshot
+        return snapshot is None or snapshot.resolved
+
+    def _changed_on_disk(self) -> bool:
+        if self.source == 'db' or not self._resolved():
+            return True  # Innehållet jämförs med digest efter omladdningen
+        try:
+            return os.stat(self.mock_path).st_mtime_ns != self._mtime
+        except OSError:
+            return False
+
+    def _interval(self) -> float:
+        if self._resolved():
+            return self.reload_interval
+        return min(self.reload_interval, SCENARIO_CATALOG_RETRY_INTERVAL) if self.reload_interval > 0 else SCENARIO_CATALOG_RETRY_INTERVAL
+
+    def _watch(self) -> None:
+        while True:
+            interval = self._interval()
+            # Utan omladdning behövs tråden bara tills ID:na gått att slå upp
+            if interval <= 0 or self._stop.wait(interval):
+                self._watcher = None
+                return
+            if self._changed_on_disk():
+                self.reload()
+
+    def start(self) -> None:
+        """
+        Loads the catalog and watches the source in a background thread, if
+        reloading is configured or the database IDs still need to be looked up.
+        """
+        self.current()
+        if self._interval() > 0 and self._watcher is None:
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name='scenario-catalog', daemon=True)
+            self._watcher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._watcher = None
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            'source': self.source,
+            'version': snapshot.version if snapshot else 0,
+            'digest': snapshot.digest[:12] if snapshot else '',
+            'scenarios': len(snapshot.scenarios) if snapshot else 0,
+            'loaded_at': snapshot.loaded_at if snapshot else 0.0,
+            'resolved': snapshot.resolved if snapshot else False,
+            'reloads': self._reloads,
+            'unchanged_reloads': self._unchanged,
+            'failed_reloads': self._failures,
+            'last_error': self._last_error,
+        }
+
+
+scenario_catalog = ScenarioCatalog()
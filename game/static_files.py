@@ -0,0 +1,282 @@
+"""
+Static files
+------------
+Serves the static directories (/assets, /mock_data) through game.media.file_response
+instead of the default static mount:
+
+- Fingerprinted URLs ('logo_icon.<hash>.png') that are cached forever by the
+  browser; plain URLs are revalidated with the ETag on every use.
+- gzip/brotli copies of compressible files, computed once per file version
+  and picked from Accept-Encoding.
+- Conditional (If-None-Match) and range requests.
+- Counters for requests, 304s and bytes served per encoding.
+
+Brotli is optional; without the brotli package only gzip is precomputed.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+from game.media import file_response, IMMUTABLE_CACHE_CONTROL
+
+try:
+    import brotli
+except ImportError:  # brotli är valfritt
+    brotli = None
+
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATIC_CACHE_DIR = os.getenv('STATIC_CACHE_DIR', os.path.join(PROJECT_ROOT, 'static_cache'))
+# Ofingeravtryckta URL:er får användas men ska alltid revalideras mot ETag
+STATIC_CACHE_CONTROL = os.getenv('STATIC_CACHE_CONTROL', 'public, no-cache')
+# Mindre filer än så här komprimeras inte, vinsten äts upp av headers
+STATIC_MIN_COMPRESS_SIZE = int(os.getenv('STATIC_MIN_COMPRESS_SIZE', '1024'))
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/vnd.apple.mpegurl',
+    'image/svg+xml',
+)
+# Kodning -> filändelse för den förkomprimerade kopian, bästa först
+ENCODINGS = {'br': '.br', 'gzip': '.gz'} if brotli is not None else {'gzip': '.gz'}
+
+_FINGERPRINT_RE = re.compile(r'^(.+)\.([0-9a-f]{16})(\.[^./]+)$')
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def accepted_encodings(header: Optional[str]) -> set:
+    """Content codings the client accepts, from an Accept-Encoding header (q=0 excluded)."""
+    accepted = set()
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q=') and q[2:].strip() in ('0', '0.0', '0.00', '0.000'):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class StaticAsset:
+    """One version of a file: its content hash and the precompressed copies that were worth keeping."""
+    __slots__ = ('path', 'signature', 'digest', 'media_type', 'encoded')
+
+    def __init__(self, path: str, signature: tuple, digest: str, media_type: str, encoded: dict):
+        self.path = path
+        self.signature = signature
+        self.digest = digest
+        self.media_type = media_type
+        self.encoded = encoded
+
+
+class StaticDirectory:
+    """A directory served under a URL prefix. Assets are (re)built lazily when the file changes."""
+
+    def __init__(self, url_prefix: str, directory: str, cache_dir: str):
+        self.url_prefix = url_prefix.rstrip('/')
+        self.directory = os.path.abspath(directory)
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._assets = {}
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Local path for a relative name, or None if it escapes the directory or is not a file."""
+        path = os.path.abspath(os.path.join(self.directory, name))
+        if not path.startswith(self.directory + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def asset(self, name: str) -> Optional[StaticAsset]:
+        path = self.resolve(name)
+        if path is None:
+            return None
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        asset = self._assets.get(name)
+        if asset is not None and asset.signature == signature:
+            return asset
+
+        with self._lock:
+            asset = self._assets.get(name)
+            if asset is None or asset.signature != signature:
+                asset = self._build(name, path, signature)
+                self._assets[name] = asset
+        return asset
+
+    def _build(self, name: str, path: str, signature: tuple) -> StaticAsset:
+        digest = _file_digest(path)
+        media_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        encoded = {}
+        if signature[0] >= STATIC_MIN_COMPRESS_SIZE and media_type.startswith(COMPRESSIBLE_TYPES):
+            with open(path, 'rb') as f:
+                data = f.read()
+            base = os.path.join(self.cache_dir, self.url_prefix.strip('/'), f'{name}.{digest}')
+            os.makedirs(os.path.dirname(base), exist_ok=True)
+            for encoding, suffix in ENCODINGS.items():
+                out_path = base + suffix
+                if not os.path.exists(out_path):
+                    compressed = _compress(data, encoding)
+                    # Behåll bara kopior som faktiskt är mindre
+                    if len(compressed) > len(data) * 0.9:
+                        continue
+                    tmp_path = f'{out_path}.{threading.get_ident()}.tmp'
+                    with open(tmp_path, 'wb') as f:
+                        f.write(compressed)
+                    os.replace(tmp_path, out_path)
+                encoded[encoding] = out_path
+        return StaticAsset(path, signature, digest, media_type, encoded)
+
+    def warm(self) -> None:
+        """Hashes and precompresses every file, so the first request doesn't pay for it."""
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                name = os.path.relpath(os.path.join(root, file_name), self.directory).replace(os.sep, '/')
+                try:
+                    self.asset(name)
+                except OSError as e:
+                    print(f'Could not prepare static file {name}: {e}')
+
+    def fingerprinted_name(self, name: str) -> Optional[str]:
+        asset = self.asset(name)
+        if asset is None:
+            return None
+        stem, ext = os.path.splitext(name)
+        return f'{stem}.{asset.digest}{ext}'
+
+
+class StaticFileServer:
+    """
+    Registry of the served directories plus the request handler and counters
+    they share. mount() is idempotent, so modules that are imported together
+    can each mount the directory they need.
+    """
+
+    def __init__(self, cache_dir: str = STATIC_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._directories = {}
+        self._requests = 0
+        self._fingerprinted = 0
+        self._not_modified = 0
+        self._partial = 0
+        self._not_found = 0
+        self._bytes = {}
+
+    def mount(self, app, url_prefix: str, directory: str) -> None:
+        url_prefix = url_prefix.rstrip('/')
+        with self._lock:
+            if url_prefix in self._directories:
+                return
+            static_dir = StaticDirectory(url_prefix, directory, self.cache_dir)
+            self._directories[url_prefix] = static_dir
+
+        @app.api_route(url_prefix + '/{name:path}', methods=['GET', 'HEAD'], include_in_schema=False)
+        def serve_static(request: Request, name: str):
+            return self.serve(request, static_dir, name)
+
+        # Förbered alla filer i bakgrunden vid start
+        app.on_startup(lambda: threading.Thread(
+            target=static_dir.warm, name=f'static-warm{url_prefix.replace("/", "-")}', daemon=True
+        ).start())
+
+    def url(self, url: str) -> str:
+        """The fingerprinted (cacheable forever) URL for a static file, or the URL unchanged."""
+        for url_prefix, static_dir in self._directories.items():
+            if url.startswith(url_prefix + '/'):
+                name = url[len(url_prefix) + 1:]
+                try:
+                    fingerprinted = static_dir.fingerprinted_name(name)
+                except OSError:
+                    fingerprinted = None
+                return f'{url_prefix}/{fingerprinted}' if fingerprinted else url
+        return url
+
+    def serve(self, request: Request, static_dir: StaticDirectory, name: str) -> Response:
+        cache_control = STATIC_CACHE_CONTROL
+        asset = static_dir.asset(name)
+        if asset is None:
+            match = _FINGERPRINT_RE.match(name)
+            if match:
+                asset = static_dir.asset(match.group(1) + match.group(3))
+                # En gammal hash serverar aktuellt innehåll men får inte cachas för alltid
+                if asset is not None and asset.digest == match.group(2):
+                    cache_control = IMMUTABLE_CACHE_CONTROL
+        if asset is None:
+            with self._lock:
+                self._requests += 1
+                self._not_found += 1
+            raise HTTPException(status_code=404, detail='Not Found')
+
+        # Range-requests avser alltid den okomprimerade filen
+        encoding = None
+        if asset.encoded and not request.headers.get('range'):
+            accepted = accepted_encodings(request.headers.get('accept-encoding'))
+            encoding = next((e for e in asset.encoded if e in accepted), None)
+
+        extra_headers = {'Vary': 'Accept-Encoding'} if asset.encoded else {}
+        if encoding:
+            extra_headers['Content-Encoding'] = encoding
+        response = file_response(
+            request,
+            asset.encoded[encoding] if encoding else asset.path,
+            etag=f'{asset.digest}-{encoding}' if encoding else asset.digest,
+            cache_control=cache_control,
+            media_type=asset.media_type,
+            extra_headers=extra_headers,
+        )
+
+        sent = 0 if request.method == 'HEAD' else int(response.headers.get('content-length', 0))
+        with self._lock:
+            self._requests += 1
+            if cache_control == IMMUTABLE_CACHE_CONTROL:
+                self._fingerprinted += 1
+            if response.status_code == 304:
+                self._not_modified += 1
+            elif response.status_code == 206:
+                self._partial += 1
+            key = encoding or 'identity'
+            self._bytes[key] = self._bytes.get(key, 0) + sent
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'directories': list(self._directories),
+                'encodings': list(ENCODINGS),
+                'requests': self._requests,
+                'fingerprinted_requests': self._fingerprinted,
+                'not_modified': self._not_modified,
+                'partial': self._partial,
+                'not_found': self._not_found,
+                'bytes_served': dict(self._bytes),
+            }
+
+
+static_files = StaticFileServer()
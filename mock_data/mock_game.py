@@ -3,6 +3,8 @@ import os
 from nicegui import ui, app
 import textwrap
 
+from game.static_files import static_files
+
 
 
 #mock spelet utan databas
@@ -63,7 +65,7 @@ class GameUI:
 game = GameUI()
 
 # Lägg till static files för videor
-app.add_static_files('/mock_data', SCRIPT_DIR)
+static_files.mount(app, '/mock_data', SCRIPT_DIR)
 
 # -------------------------------------------------------
 # PAGE UI